@@ -1,10 +1,30 @@
 import os
 import json
 import re
-from rapidfuzz import fuzz
+import argparse
 
-SCRIPT_FILE = "Dark_Knight_Shots.txt"
-SHOTS_DIR = "shots"
+import numpy as np
+from rapidfuzz import fuzz, process
+from scipy.optimize import linear_sum_assignment
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- CONFIG ----------------
+SCRIPT_FILE = os.path.join(BASE_PATH, "Dark_Knight_Shots.txt")
+SHOTS_DIR = os.path.join(BASE_PATH, "shots")
+
+# partial_ratio (0-100) below which a shot is left out of the order
+MIN_SCORE = 60
+
+# candidate index: sections sharing the most SHINGLE_WORDS-word runs with a
+# shot's dialogue are the only ones fuzzy-scored (0 = score every section)
+SHINGLE_WORDS = 2
+CANDIDATES = 10
+
+# hungarian: one-to-one over all shots | monotonic: per source video, takes
+# in time order follow the script in order (several takes may share a section)
+ALIGN_METHODS = ("hungarian", "monotonic")
+# ----------------------------------------
 
 
 def normalize(text):
@@ -14,59 +34,275 @@ def normalize(text):
     return text.strip()
 
 
-# Load script
-with open(SCRIPT_FILE, "r", encoding="utf-8") as f:
-    raw_script = f.read()
+def load_script(script_file=SCRIPT_FILE):
+    # → [{"shot_number", "text"}] from the explicit "Shot N:" markers
+    with open(script_file, "r", encoding="utf-8") as f:
+        raw_script = f.read()
 
-# Split script by explicit Shot markers
-shot_sections = re.split(r"(Shot\s+\d+\s*:)", raw_script)
+    shot_sections = re.split(r"(Shot\s+\d+\s*:)", raw_script)
 
-script_shots = []
-for i in range(1, len(shot_sections), 2):
-    shot_title = shot_sections[i]
-    shot_text = shot_sections[i + 1]
-    shot_number = int(re.search(r"\d+", shot_title).group())
-    script_shots.append({"shot_number": shot_number, "text": normalize(shot_text)})
+    script_shots = []
+    for i in range(1, len(shot_sections), 2):
+        shot_title = shot_sections[i]
+        shot_text = shot_sections[i + 1]
+        shot_number = int(re.search(r"\d+", shot_title).group())
+        script_shots.append({"shot_number": shot_number, "text": normalize(shot_text)})
 
-results = []
+    return script_shots
 
-for file in os.listdir(SHOTS_DIR):
-    if not file.endswith(".json"):
-        continue
 
-    with open(os.path.join(SHOTS_DIR, file), "r", encoding="utf-8") as f:
-        shot = json.load(f)
+def load_shots(shots_dir=SHOTS_DIR):
+    # → [{"shot_id", "file", "dialogue"}] with normalised dialogue
+    shots = []
 
-    dialogue = normalize(shot["signals"]["dialogue"])
-    shot_id = shot["shot_id"]
+    for file in sorted(os.listdir(shots_dir)):
+        if not file.endswith(".json"):
+            continue
 
-    best_score = 0
-    best_script_shot = None
+        with open(os.path.join(shots_dir, file), "r", encoding="utf-8") as f:
+            shot = json.load(f)
 
-    for section in script_shots:
-        score = fuzz.partial_ratio(dialogue, section["text"])
-        if score > best_score:
-            best_score = score
-            best_script_shot = section["shot_number"]
+        shots.append({
+            "shot_id": shot["shot_id"],
+            "file": file,
+            "dialogue": normalize(shot["signals"]["dialogue"]),
+            # takes of one video (build_shots windows) are aligned together
+            "source_video": shot.get("source_video") or shot["shot_id"],
+            "start_time": float(shot.get("start_time") or 0.0),
+        })
 
-    if best_score < 60:
-        print(f"⚠️ Low confidence for {shot_id} (score={best_score})")
-        continue
+    return shots
 
-    results.append(
-        {
-            "shot_id": shot_id,
-            "file": file,
-            "script_shot": best_script_shot,
-            "score": best_score,
-        }
+
+def score_matrix(shots, script_shots, threshold=0, workers=-1):
+    # shots × script sections partial_ratio, computed in C++ across all cores;
+    # pairs below `threshold` bail out early and score 0
+    return process.cdist(
+        [shot["dialogue"] for shot in shots],
+        [section["text"] for section in script_shots],
+        scorer=fuzz.partial_ratio,
+        score_cutoff=threshold,
+        dtype=np.float32,
+        workers=workers,
     )
 
-# Sort by script shot number
-results.sort(key=lambda x: x["script_shot"])
 
-print("\n🎬 FINAL CORRECT SHOT ORDER:\n")
-for i, r in enumerate(results, 1):
-    print(
-        f"{i}. {r['shot_id']} ({r['file']}) → Script Shot {r['script_shot']}  score={r['score']}"
+class ShingleIndex:
+    # Inverted index of word n-grams ("shingles") over the normalised script
+    # sections, built once per script. A shot's candidates are the sections
+    # sharing the most idf-weighted shingles with its dialogue, so fuzzy
+    # scoring touches a handful of sections instead of all of them.
+    def __init__(self, script_shots, n=SHINGLE_WORDS):
+        self.n = n
+        self.n_sections = len(script_shots)
+
+        postings = {}
+        for col, section in enumerate(script_shots):
+            for shingle in self.shingles(section["text"]):
+                postings.setdefault(shingle, []).append(col)
+
+        self.postings = {
+            shingle: (np.array(cols, dtype=np.int32), np.log(1 + self.n_sections / len(cols)))
+            for shingle, cols in postings.items()
+        }
+
+    def shingles(self, text):
+        words = text.split()
+        return {" ".join(words[i:i + self.n]) for i in range(len(words) - self.n + 1)}
+
+    def candidates(self, text, k=CANDIDATES):
+        # → up to k section indices, best first; empty if nothing is shared
+        weights = np.zeros(self.n_sections, dtype=np.float32)
+        for shingle in self.shingles(text):
+            hit = self.postings.get(shingle)
+            if hit is not None:
+                weights[hit[0]] += hit[1]
+
+        matched = np.flatnonzero(weights)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-weights[matched], k - 1)[:k]]
+        return matched[np.argsort(-weights[matched], kind="stable")]
+
+
+def candidate_score_matrix(shots, script_shots, index, k=CANDIDATES, threshold=0, workers=-1):
+    # Same matrix as score_matrix, but only each shot's k candidate sections
+    # are scored (the rest stay 0). Shots sharing no shingle with the script
+    # (e.g. a two-word line) fall back to a full row.
+    scores = np.zeros((len(shots), len(script_shots)), dtype=np.float32)
+    texts = [section["text"] for section in script_shots]
+
+    for row, shot in enumerate(shots):
+        cols = index.candidates(shot["dialogue"], k)
+        if not len(cols):
+            scores[row] = score_matrix([shot], script_shots, threshold, workers)[0]
+            continue
+
+        for col in cols:
+            scores[row, col] = fuzz.partial_ratio(
+                shot["dialogue"], texts[col], score_cutoff=threshold
+            )
+
+    return scores
+
+
+class _PrefixMax:
+    # Fenwick tree over section positions: best (total, entry) among
+    # positions ≤ i, in O(log n) per query / update
+    def __init__(self, n):
+        self.total = np.full(n + 1, -np.inf)
+        self.entry = np.full(n + 1, -1, dtype=np.int64)
+
+    def update(self, i, total, entry):
+        i += 1
+        while i < len(self.total):
+            if total > self.total[i]:
+                self.total[i] = total
+                self.entry[i] = entry
+            i += i & -i
+
+    def query(self, i):
+        best, entry = 0.0, -1
+        i += 1
+        while i > 0:
+            if self.total[i] > best:
+                best, entry = self.total[i], self.entry[i]
+            i -= i & -i
+        return best, entry
+
+
+def monotonic_chain(rows, scores, threshold=MIN_SCORE):
+    # rows: one video's takes in time order. → [(row, col)] maximising the
+    # total score such that the script position never moves backwards;
+    # takes whose match would break script order are left out. Heaviest
+    # chain over the candidate pairs: O(pairs · log sections).
+    tree = _PrefixMax(scores.shape[1])
+    entries = []  # (row, col, previous entry)
+
+    for row in rows:
+        cols = np.flatnonzero(scores[row] >= max(threshold, 1e-6))
+
+        # query before update → at most one pair per take on a chain
+        found = []
+        for col in cols:
+            total, prev = tree.query(col)
+            found.append((col, total + float(scores[row, col]), prev))
+
+        for col, total, prev in found:
+            entries.append((row, col, prev))
+            tree.update(col, total, len(entries) - 1)
+
+    _, entry = tree.query(scores.shape[1] - 1)
+    chain = []
+    while entry >= 0:
+        row, col, entry = entries[entry]
+        chain.append((row, col))
+    return chain[::-1]
+
+
+def align_hungarian(shots, scores):
+    rows, cols = linear_sum_assignment(scores, maximize=True)
+    return list(zip(rows, cols))
+
+
+def align_monotonic(shots, scores, threshold=MIN_SCORE):
+    videos = {}
+    for row, shot in enumerate(shots):
+        videos.setdefault(shot["source_video"], []).append(row)
+
+    pairs = []
+    for rows in videos.values():
+        rows.sort(key=lambda row: shots[row]["start_time"])
+        pairs += monotonic_chain(rows, scores, threshold)
+    return pairs
+
+
+def arrange_shots(shots=None, script_shots=None, threshold=MIN_SCORE, workers=-1,
+                  align="hungarian", candidates=CANDIDATES, index=None):
+    # Global shot ↔ script section assignment instead of each shot greedily
+    # taking its best section: one-to-one (Hungarian, maximum total score)
+    # or monotonic (see monotonic_chain). `candidates` > 0 scores only the
+    # sections a ShingleIndex proposes (pass `index` to reuse one).
+    # → (matched shots in script order, [unmatched shots with their best
+    # score, 0 when no section reaches the threshold])
+    if align not in ALIGN_METHODS:
+        raise ValueError(f"Unknown alignment: {align} (choose from {', '.join(ALIGN_METHODS)})")
+
+    shots = load_shots() if shots is None else shots
+    script_shots = load_script() if script_shots is None else script_shots
+
+    if not shots or not script_shots:
+        return [], [dict(shot, score=0.0) for shot in shots]
+
+    if candidates and len(script_shots) > candidates:
+        index = index or ShingleIndex(script_shots)
+        scores = candidate_score_matrix(shots, script_shots, index, candidates, threshold, workers)
+    else:
+        scores = score_matrix(shots, script_shots, threshold, workers)
+
+    if align == "hungarian":
+        pairs = align_hungarian(shots, scores)
+    else:
+        pairs = align_monotonic(shots, scores, threshold)
+
+    results = []
+    matched = set()
+    for row, col in sorted(pairs, key=lambda pair: (pair[1], shots[pair[0]]["start_time"])):
+        score = float(scores[row, col])
+        if score < threshold:
+            continue
+
+        matched.add(row)
+        results.append({
+            "shot_id": shots[row]["shot_id"],
+            "file": shots[row]["file"],
+            "script_shot": script_shots[col]["shot_number"],
+            "score": score,
+        })
+
+    unmatched = [
+        {"shot_id": shot["shot_id"], "file": shot["file"], "score": float(scores[row].max())}
+        for row, shot in enumerate(shots)
+        if row not in matched
+    ]
+
+    # Sort by script shot number (stable → takes of one section stay in time order)
+    results.sort(key=lambda x: x["script_shot"])
+    return results, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order shots by where their dialogue appears in the script")
+    parser.add_argument("--script", default=SCRIPT_FILE)
+    parser.add_argument("--shots-dir", default=SHOTS_DIR)
+    parser.add_argument("--threshold", type=float, default=MIN_SCORE)
+    parser.add_argument("--workers", type=int, default=-1, help="-1 = all cores")
+    parser.add_argument("--align", choices=ALIGN_METHODS, default="hungarian")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES,
+                        help="sections fuzzy-scored per shot (0 = all)")
+    args = parser.parse_args()
+
+    results, unmatched = arrange_shots(
+        load_shots(args.shots_dir),
+        load_script(args.script),
+        threshold=args.threshold,
+        workers=args.workers,
+        align=args.align,
+        candidates=args.candidates,
     )
+
+    for shot in unmatched:
+        if shot["score"]:
+            # a better-scoring shot took its section
+            print(f"⚠️ No section left for {shot['shot_id']} (best score={shot['score']:.1f})")
+        else:
+            print(f"⚠️ Low confidence for {shot['shot_id']} (score < {args.threshold:g})")
+
+    print("\n🎬 FINAL CORRECT SHOT ORDER:\n")
+    for i, r in enumerate(results, 1):
+        print(
+            f"{i}. {r['shot_id']} ({r['file']}) → Script Shot {r['script_shot']}  score={r['score']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
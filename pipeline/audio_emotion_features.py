@@ -2,7 +2,6 @@ import os
 import json
 import numpy as np
 import librosa
-import tensorflow as tf
 
 # ================= CONFIG =================
 AUDIO_PATH = "outputs/audio.wav"
@@ -13,19 +12,43 @@ OUTPUT_PATH = "outputs/audio_emotion_segments.json"
 SAMPLE_RATE = 22050
 N_MELS = 128
 TARGET_FRAMES = 282
+HOP_LENGTH = 512  # librosa default, frame t is centred on sample t * HOP_LENGTH
+MIN_SEGMENT_SECONDS = 0.3
+
+# segments per model.predict call
+PREDICT_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "64"))
+# streaming mode: audio decoded this many seconds at a time
+STREAM_BLOCK_SECONDS = float(os.getenv("EMOTION_BLOCK_SECONDS", "60"))
 
 EMOTIONS = ["neutral", "calm", "happy", "sad", "angry", "fearful", "disgust"]
 # ==========================================
 
+_models = {}
 
-def extract_mel_segment(y, sr):
-    mel = librosa.feature.melspectrogram(
+
+def load_emotion_model(model_path=MODEL_PATH):
+    # one Keras model per process (pipeline workers reuse it across videos)
+    if model_path not in _models:
+        import tensorflow as tf
+
+        _models[model_path] = tf.keras.models.load_model(model_path)
+    return _models[model_path]
+
+
+def track_mel(y, sr=SAMPLE_RATE):
+    # power mel spectrogram of the whole track, computed once
+    return librosa.feature.melspectrogram(
         y=y,
         sr=sr,
         n_mels=N_MELS,
-        fmax=8000
+        fmax=8000,
+        hop_length=HOP_LENGTH,
     )
 
+
+def mel_to_features(mel):
+    # same normalisation the model was trained with: dB relative to the
+    # segment's own peak, pad / trim to TARGET_FRAMES, min-max to [0, 1]
     mel_db = librosa.power_to_db(mel, ref=np.max)
 
     # pad / trim time axis
@@ -37,59 +60,238 @@ def extract_mel_segment(y, sr):
 
     mel_db = (mel_db - mel_db.min()) / (mel_db.max() - mel_db.min() + 1e-6)
 
-    mel_db = np.expand_dims(mel_db, axis=-1)
-    mel_db = np.expand_dims(mel_db, axis=0)
+    return mel_db[..., np.newaxis]
 
-    return mel_db
 
+def extract_mel_segment(y, sr):
+    # single segment → model input of shape (1, N_MELS, TARGET_FRAMES, 1)
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=N_MELS, fmax=8000)
+    return mel_to_features(mel)[np.newaxis]
 
-def main():
-    print("🔥 Segment-level audio emotion extraction 🔥")
 
-    model = tf.keras.models.load_model(MODEL_PATH)
+def segment_frames(seg, sr, n_samples):
+    # → (first, last) mel frame of a transcript segment, or None to skip it
+    start_sample = int(float(seg["start"]) * sr)
+    end_sample = min(int(float(seg["end"]) * sr), n_samples)
 
-    y, sr = librosa.load(AUDIO_PATH, sr=SAMPLE_RATE)
+    if end_sample <= start_sample:
+        return None
 
-    with open(TRANSCRIPT_PATH, "r") as f:
-        transcript = json.load(f)
+    # skip tiny segments
+    if end_sample - start_sample < sr * MIN_SEGMENT_SECONDS:
+        return None
 
-    results = []
+    # a standalone melspectrogram of the segment has 1 + len // hop frames
+    first = start_sample // HOP_LENGTH
+    n_frames = 1 + (end_sample - start_sample) // HOP_LENGTH
+    return first, first + min(n_frames, TARGET_FRAMES)
+
+
+def make_result(seg, preds):
+    idx = int(np.argmax(preds))
+    return {
+        "start": float(seg["start"]),
+        "end": float(seg["end"]),
+        "text": seg["text"],
+        "emotion": EMOTIONS[idx],
+        "confidence": float(preds[idx]),
+        "scores": {
+            EMOTIONS[i]: float(preds[i]) for i in range(len(preds))
+        }
+    }
+
+
+def score_segments(y, transcript, sr=SAMPLE_RATE, model=None,
+                   batch_size=PREDICT_BATCH_SIZE):
+    # One mel for the whole track; each segment's frames are sliced out and
+    # stacked, and the model runs once per batch instead of once per segment.
+    model = model or load_emotion_model()
+    mel = track_mel(y, sr)
 
+    jobs = []
     for seg in transcript:
-        start = float(seg["start"])
-        end = float(seg["end"])
+        frames = segment_frames(seg, sr, len(y))
+        if frames is not None:
+            jobs.append((seg, frames))
 
-        start_sample = int(start * sr)
-        end_sample = int(end * sr)
+    results = []
+    for i in range(0, len(jobs), batch_size):
+        chunk = jobs[i:i + batch_size]
+        batch = np.stack([mel_to_features(mel[:, a:b]) for _, (a, b) in chunk])
 
-        if end_sample <= start_sample:
-            continue
+        preds = model.predict_on_batch(batch)
+        preds = np.asarray(preds)
+
+        results.extend(make_result(seg, p) for (seg, _), p in zip(chunk, preds))
+
+    return results
+
+
+def analyze_audio_emotions(audio, transcript, output_path=None, model_path=MODEL_PATH,
+                           batch_size=PREDICT_BATCH_SIZE):
+    # audio: mono float32 buffer at SAMPLE_RATE (e.g. extract_audio.load_audio(
+    # video, sr=SAMPLE_RATE)) or a path librosa can read
+    # transcript: list of {"start", "end", "text"} segments (or a JSON path)
+    if isinstance(audio, str):
+        audio, _ = librosa.load(audio, sr=SAMPLE_RATE)
+
+    if isinstance(transcript, str):
+        with open(transcript, "r") as f:
+            transcript = json.load(f)
+
+    results = score_segments(
+        audio, transcript, model=load_emotion_model(model_path), batch_size=batch_size
+    )
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+########################################
+# STREAMING (BOUNDED MEMORY)
+########################################
+def _segment_span(seg, sr):
+    # samples a segment's features actually depend on: the model only sees
+    # its first TARGET_FRAMES frames (plus one FFT window of context)
+    start = int(float(seg["start"]) * sr)
+    end = int(float(seg["end"]) * sr)
+    needed = min(end, start + TARGET_FRAMES * HOP_LENGTH + 2048)
+    return start, end, needed
 
-        y_seg = y[start_sample:end_sample]
 
-        # skip tiny segments
-        if len(y_seg) < sr * 0.3:
+def stream_segment_emotions(blocks, transcript, sr=SAMPLE_RATE, model=None,
+                            batch_size=PREDICT_BATCH_SIZE):
+    # blocks: iterable of consecutive mono float32 arrays (e.g.
+    # extract_audio.stream_audio(video, sr=SAMPLE_RATE)). Yields one result
+    # per segment as soon as the audio it needs has arrived; audio no pending
+    # segment overlaps is dropped unscored, so memory is one block plus at
+    # most one segment's feature span, independent of the film's length.
+    # `transcript` may also be a live iterator in time order (e.g.
+    # pause_detection.follow_jsonl on a transcript still being written):
+    # segments are pulled only as far as the audio has got, waiting for
+    # the transcriber when it is behind.
+    model = model or load_emotion_model()
+
+    if isinstance(transcript, list):
+        transcript = sorted(transcript, key=lambda seg: float(seg["start"]))
+    arrivals = (seg for seg in transcript if float(seg["end"]) > float(seg["start"]))
+
+    pending = []
+    pulled_to = -1  # start sample of the latest segment pulled
+
+    def pull(until):
+        # every segment starting before sample `until` → pending
+        nonlocal pulled_to
+        while pulled_to < until:
+            seg = next(arrivals, None)
+            if seg is None:
+                pulled_to = float("inf")
+                break
+            pending.append(seg)
+            pulled_to = int(float(seg["start"]) * sr)
+
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0  # absolute sample index of buffer[0]
+    pos = 0           # absolute sample index where the next block begins
+
+    def flush(final=False):
+        nonlocal buffer, buffer_start, pending
+        buffer_end = buffer_start + len(buffer)
+
+        ready = []
+        while pending:
+            start, end, needed = _segment_span(pending[0], sr)
+            if needed > buffer_end and not final:
+                break
+            seg = pending.pop(0)
+            if start < buffer_start or min(end, buffer_end) - start < sr * MIN_SEGMENT_SECONDS:
+                continue  # tiny, or starts before the audio we kept
+            ready.append((seg, start, min(needed, buffer_end)))
+
+        for i in range(0, len(ready), batch_size):
+            chunk = ready[i:i + batch_size]
+
+            # one mel over the region the chunk covers, sliced per segment
+            lo = min(start for _, start, _ in chunk)
+            hi = max(needed for _, _, needed in chunk)
+            mel = track_mel(buffer[lo - buffer_start:hi - buffer_start], sr)
+
+            batch = []
+            for seg, start, needed in chunk:
+                first = (start - lo) // HOP_LENGTH
+                n_frames = 1 + (min(int(float(seg["end"]) * sr), needed) - start) // HOP_LENGTH
+                batch.append(mel_to_features(mel[:, first:first + min(n_frames, TARGET_FRAMES)]))
+
+            preds = np.asarray(model.predict_on_batch(np.stack(batch)))
+            yield from (make_result(seg, p) for (seg, _, _), p in zip(chunk, preds))
+
+        # keep only what the next pending segment still needs
+        keep_from = buffer_end
+        if pending:
+            keep_from = min(keep_from, max(buffer_start, _segment_span(pending[0], sr)[0]))
+        buffer = buffer[keep_from - buffer_start:]
+        buffer_start = keep_from
+
+    for block in blocks:
+        block_start, pos = pos, pos + len(block)
+        pull(pos)
+
+        # block ends before the next pending segment starts → skip it
+        if not pending or _segment_span(pending[0], sr)[0] >= pos:
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = pos
             continue
 
-        features = extract_mel_segment(y_seg, sr)
-
-        preds = model.predict(features, verbose=0)[0]
-        idx = int(np.argmax(preds))
-
-        results.append({
-            "start": start,
-            "end": end,
-            "text": seg["text"],
-            "emotion": EMOTIONS[idx],
-            "confidence": float(preds[idx]),
-            "scores": {
-                EMOTIONS[i]: float(preds[i]) for i in range(len(preds))
-            }
-        })
-
-    os.makedirs("outputs", exist_ok=True)
-    with open(OUTPUT_PATH, "w") as f:
-        json.dump(results, f, indent=2)
+        if len(buffer) == 0:
+            buffer_start = block_start
+        buffer = np.concatenate([buffer, block])
+
+        yield from flush()
+
+    # audio ended: score whatever is left with the samples we have
+    pull(float("inf"))
+    yield from flush(final=True)
+
+
+def analyze_audio_emotions_streaming(source, transcript, output_path=None,
+                                     model_path=MODEL_PATH, batch_size=PREDICT_BATCH_SIZE,
+                                     block_seconds=STREAM_BLOCK_SECONDS):
+    # source: video / audio file decoded block by block through ffmpeg.
+    # Results are appended to `output_path` (JSONL) as they are produced.
+    from pipeline.extract_audio import stream_audio
+    from pipeline.pause_detection import tee_jsonl
+
+    if isinstance(transcript, str):
+        with open(transcript, "r") as f:
+            transcript = json.load(f)
+
+    results = stream_segment_emotions(
+        stream_audio(source, sr=SAMPLE_RATE, block_seconds=block_seconds),
+        transcript,
+        model=load_emotion_model(model_path),
+        batch_size=batch_size,
+    )
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        results = tee_jsonl(results, output_path)
+
+    count = 0
+    for _ in results:
+        count += 1
+    return count
+
+
+def main(audio=None):
+    print("🔥 Segment-level audio emotion extraction 🔥")
+
+    results = analyze_audio_emotions(
+        AUDIO_PATH if audio is None else audio, TRANSCRIPT_PATH, OUTPUT_PATH
+    )
 
     print(f"✅ Saved {len(results)} segment emotions → {OUTPUT_PATH}")
 
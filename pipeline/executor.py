@@ -0,0 +1,163 @@
+import time
+import traceback
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+# Stage kinds:
+#   "io"  → runs on the thread pool (audio extraction, JSON writes)
+#   "cpu" → runs on the process pool (transcription, emotion scoring)
+IO_STAGE = "io"
+CPU_STAGE = "cpu"
+
+
+class Stage:
+    # follows=True → submitted together with the stage before it instead of
+    # after it, for stages that consume that stage's output as it is written
+    # (e.g. tailing a JSONL file, see pause_detection.follow_jsonl)
+    def __init__(self, name, fn, kind=IO_STAGE, follows=False):
+        if kind not in (IO_STAGE, CPU_STAGE):
+            raise ValueError(f"Unknown stage kind: {kind}")
+
+        self.name = name
+        self.fn = fn
+        self.kind = kind
+        self.follows = follows
+
+
+class PipelineResult:
+    def __init__(self):
+        self.completed = []
+        self.skipped = []
+        self.failed = {}
+        self.stage_seconds = {}
+        self.wall_seconds = 0.0
+
+    def add_stage_time(self, stage_name, seconds):
+        self.stage_seconds[stage_name] = (
+            self.stage_seconds.get(stage_name, 0.0) + seconds
+        )
+
+    def summary(self):
+        total = len(self.completed) + len(self.skipped) + len(self.failed)
+        rate = (
+            len(self.completed) / self.wall_seconds * 60
+            if self.wall_seconds > 0 else 0.0
+        )
+
+        lines = [
+            f"📊 {total} videos in {self.wall_seconds:.1f}s "
+            f"({len(self.completed)} done, {len(self.skipped)} skipped, "
+            f"{len(self.failed)} failed)",
+            f"   throughput: {rate:.2f} videos/min",
+        ]
+
+        for name, seconds in self.stage_seconds.items():
+            lines.append(f"   {name:<12} {seconds:8.1f}s (summed over workers)")
+
+        for item, error in self.failed.items():
+            lines.append(f"   ❌ {item}: {error}")
+
+        return "\n".join(lines)
+
+
+def _timed_call(fn, job):
+    start = time.perf_counter()
+    out = fn(job)
+    return out, time.perf_counter() - start
+
+
+def run_pipeline(items, prepare, stages, io_pool=None, cpu_pool=None, workers=2):
+    # Every item moves to its next stage as soon as the previous one
+    # finishes, so extraction of one video overlaps with transcription of
+    # another. `prepare(item)` builds the job dict (or returns None to skip)
+    # on the I/O pool, so hashing one video doesn't hold up the others; each
+    # stage takes the job and returns it. A failure only drops that item.
+    # Stages marked `follows` start alongside their predecessor; the item
+    # moves on once the whole group is done, with the first stage's job.
+    result = PipelineResult()
+    wall_start = time.perf_counter()
+
+    own_io = io_pool is None
+    own_cpu = cpu_pool is None
+    if own_io:
+        io_pool = ThreadPoolExecutor(max_workers=max(2, workers * 2))
+    if own_cpu:
+        cpu_pool = ProcessPoolExecutor(max_workers=workers)
+
+    pools = {IO_STAGE: io_pool, CPU_STAGE: cpu_pool}
+    pending = {}
+    groups = {}  # item → [stages of its current group still running, job, end]
+
+    def submit(item, job, stage_idx):
+        # the stage plus every `follows` stage right after it, all at once
+        end = stage_idx + 1
+        while end < len(stages) and stages[end].follows:
+            end += 1
+
+        groups[item] = [end - stage_idx, job, end]
+        for idx in range(stage_idx, end):
+            stage = stages[idx]
+            future = pools[stage.kind].submit(_timed_call, stage.fn, job)
+            pending[future] = (item, idx)
+
+    try:
+        for item in items:
+            # stage index -1 = prepare
+            pending[io_pool.submit(_timed_call, prepare, item)] = (item, -1)
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                item, stage_idx = pending.pop(future)
+                stage_name = stages[stage_idx].name if stage_idx >= 0 else "prepare"
+
+                try:
+                    job, seconds = future.result()
+                except Exception as e:
+                    # the first error of a group is the one reported
+                    result.failed.setdefault(item, f"{stage_name}: {e}")
+                    traceback.print_exc()
+                    job, seconds = None, None
+
+                if seconds is not None:
+                    result.add_stage_time(stage_name, seconds)
+
+                if stage_idx < 0:
+                    if item in result.failed:
+                        continue
+                    if job is None:
+                        result.skipped.append(item)
+                    elif stages:
+                        submit(item, job, 0)
+                    else:
+                        result.completed.append(item)
+                    continue
+
+                group = groups[item]
+                group[0] -= 1
+                if not stages[stage_idx].follows and job is not None:
+                    group[1] = job  # the group's first stage hands on its job
+                if group[0]:
+                    continue
+
+                del groups[item]
+                if item in result.failed:
+                    continue
+
+                if group[2] < len(stages):
+                    submit(item, group[1], group[2])
+                else:
+                    result.completed.append(item)
+    finally:
+        if own_io:
+            io_pool.shutdown(wait=True)
+        if own_cpu:
+            cpu_pool.shutdown(wait=True)
+
+    result.wall_seconds = time.perf_counter() - wall_start
+    return result
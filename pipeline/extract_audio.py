@@ -1,8 +1,20 @@
 from moviepy.editor import VideoFileClip
 import numpy as np
 from moviepy.editor import AudioClip
+import subprocess
+import wave
 import os
 
+# Whisper works on 16 kHz mono float32
+SAMPLE_RATE = 16000
+
+
+def _silence(t):
+    # vectorised: moviepy passes whole chunks of timestamps at once
+    if np.ndim(t) == 0:
+        return np.zeros((1,), dtype=np.float32)
+    return np.zeros((len(t), 1), dtype=np.float32)
+
 
 def extract_audio(video_path, audio_path):
     clip = VideoFileClip(video_path)
@@ -12,15 +24,115 @@ def extract_audio(video_path, audio_path):
     else:
         duration = clip.duration
 
-        def silence(t):
-            return np.zeros((1,), dtype=np.float32)
-
-        silent_audio = AudioClip(silence, duration=duration, fps=16000)
+        silent_audio = AudioClip(_silence, duration=duration, fps=16000)
         silent_audio.write_audiofile(audio_path)
 
     clip.close()
 
 
+########################################
+# IN-MEMORY DECODE (NO WAV ROUND-TRIP)
+########################################
+def _ffmpeg_exe():
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+
+def _decode_cmd(video_path, sr):
+    # ffmpeg → raw mono float32 at `sr` on stdout
+    return [
+        _ffmpeg_exe(),
+        "-nostdin",
+        "-loglevel", "error",
+        "-i", video_path,
+        "-vn",
+        "-ac", "1",
+        "-ar", str(sr),
+        "-f", "f32le",
+        "-",
+    ]
+
+
+def silent_buffer(duration, sr=SAMPLE_RATE):
+    return np.zeros(int(round(duration * sr)), dtype=np.float32)
+
+
+def _video_duration(video_path):
+    clip = VideoFileClip(video_path, audio=False)
+    duration = clip.duration
+    clip.close()
+    return duration
+
+
+def load_audio(video_path, sr=SAMPLE_RATE, wav_path=None):
+    # Pipe the audio track through ffmpeg straight into a mono float32 buffer
+    proc = subprocess.run(_decode_cmd(video_path, sr), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if proc.returncode == 0:
+        audio = np.frombuffer(proc.stdout, dtype=np.float32)
+    elif b"does not contain any stream" in proc.stderr:
+        # no audio track → zero buffer of the video's length
+        audio = silent_buffer(_video_duration(video_path), sr)
+    else:
+        raise RuntimeError(
+            f"ffmpeg failed on {video_path}: {proc.stderr.decode(errors='ignore').strip()}"
+        )
+
+    # WAV output is opt-in (--write-wav)
+    if wav_path:
+        write_wav(wav_path, audio, sr)
+
+    return audio
+
+
+def stream_audio(video_path, sr=SAMPLE_RATE, block_seconds=60.0):
+    # Same decode as load_audio, but yields fixed-size float32 blocks as
+    # ffmpeg produces them → memory stays at one block whatever the length
+    block_bytes = int(block_seconds * sr) * 4
+    proc = subprocess.Popen(_decode_cmd(video_path, sr), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[: len(data) // 4 * 4], dtype=np.float32)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode == 0:
+        return
+
+    if b"does not contain any stream" in stderr:
+        # no audio track → silent blocks for the video's length
+        remaining = int(round(_video_duration(video_path) * sr))
+        block = int(block_seconds * sr)
+        while remaining > 0:
+            yield np.zeros(min(block, remaining), dtype=np.float32)
+            remaining -= block
+        return
+
+    raise RuntimeError(
+        f"ffmpeg failed on {video_path}: {stderr.decode(errors='ignore').strip()}"
+    )
+
+
+def write_wav(path, audio, sr=SAMPLE_RATE):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(pcm.tobytes())
+
+
 if __name__ == "__main__":
     os.makedirs("outputs", exist_ok=True)
     extract_audio(
@@ -1,46 +1,159 @@
+import os
 import json
+import time
 
 INPUT_TRANSCRIPT = "outputs/transcript.json"
 OUTPUT_TIMELINE = "outputs/timeline.json"
 
+# how often follow_jsonl looks for new lines from a writer
+FOLLOW_POLL_SECONDS = 0.2
 
-def detect_silence_from_transcript(transcript, video_end_time=None):
-    timeline = []
 
-    for i in range(len(transcript)):
-        current = transcript[i]
+def _silence(start, end):
+    return {
+        "type": "Silence",
+        "start": round(start, 2),
+        "end": round(end, 2),
+        "duration": round(end - start, 2)
+    }
+
+
+class _GapSilences:
+    # Silence entries for the gap [start, end] between two speech segments:
+    # inferred from the gap itself, or, with measured `silences` (sorted
+    # (start, end) pairs from pipeline.vad), only the parts actually silent.
+    def __init__(self, silences=None):
+        self.silences = silences
+        self.next = 0  # gaps arrive in time order → one pass over silences
+
+    def __call__(self, start, end):
+        if self.silences is None:
+            if end > start:
+                yield _silence(start, end)
+            return
+
+        while self.next < len(self.silences) and self.silences[self.next][1] <= start:
+            self.next += 1
+
+        for i in range(self.next, len(self.silences)):
+            s, e = self.silences[i]
+            if s >= end:
+                break
+            s, e = max(s, start), min(e, end)
+            if e - s >= 0.01:
+                yield _silence(s, e)
+
+
+def stream_timeline(segments, video_end_time=None, silences=None):
+    # Consumes transcript segments one at a time (e.g. straight from the
+    # Whisper iterator) and yields timeline entries as soon as they are known.
+    # With measured silences the timeline starts at 0: the silence before the
+    # first speech is emitted too.
+    gap_silences = _GapSilences(silences)
+    prev = None
+
+    for current in segments:
+        # Add silence between speeches (and before the first one, if measured)
+        if prev is not None:
+            yield from gap_silences(prev["end"], current["start"])
+        elif silences is not None:
+            yield from gap_silences(0.0, current["start"])
 
         # Add speech segment
-        timeline.append({
+        yield {
             "type": "Speech",
             "start": round(current["start"], 2),
             "end": round(current["end"], 2),
             "text": current.get("text", "")
-        })
-
-        # Add silence between speeches
-        if i < len(transcript) - 1:
-            next_seg = transcript[i + 1]
-            if next_seg["start"] > current["end"]:
-                timeline.append({
-                    "type": "Silence",
-                    "start": round(current["end"], 2),
-                    "end": round(next_seg["start"], 2),
-                    "duration": round(next_seg["start"] - current["end"], 2)
-                })
-
-    # Optional silence after last speech
-    if video_end_time is not None:
-        last_end = transcript[-1]["end"]
-        if video_end_time > last_end:
-            timeline.append({
-                "type": "Silence",
-                "start": round(last_end, 2),
-                "end": round(video_end_time, 2),
-                "duration": round(video_end_time - last_end, 2)
-            })
-
-    return timeline
+        }
+
+        prev = current
+
+    # Optional silence after last speech (a measured track with no speech at
+    # all is silent throughout)
+    if video_end_time is not None and prev is not None:
+        yield from gap_silences(prev["end"], video_end_time)
+    elif video_end_time is not None and silences is not None:
+        yield from gap_silences(0.0, video_end_time)
+
+
+def detect_silence_from_transcript(transcript, video_end_time=None, silences=None):
+    return list(stream_timeline(transcript, video_end_time, silences))
+
+
+def tee_jsonl(entries, path):
+    # Passes entries through while appending each one to `path`, so nothing
+    # is held in memory and an interrupted run keeps what it had written.
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            yield entry
+
+
+def read_jsonl(path):
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+# Hand-off protocol for a JSONL file read while it is being written: the
+# writer appends to "<path>.part" and renames it to `path` when complete, or
+# leaves "<path>.failed" if it gives up (see follow_jsonl).
+def reset_follow(path):
+    # before a new writer starts: no stale output a reader could mistake
+    # for this run's
+    for stale in (path, path + ".part", path + ".failed"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def mark_failed(path):
+    with open(path + ".failed", "w"):
+        pass
+
+
+def follow_jsonl(path, poll_seconds=FOLLOW_POLL_SECONDS):
+    # Yields the entries of `path` as its writer appends them, waiting for
+    # more until the file is complete; RuntimeError if the writer failed.
+    part, failed = path + ".part", path + ".failed"
+
+    f = None
+    while f is None:
+        if os.path.exists(failed):
+            raise RuntimeError(f"writer of {path} failed")
+        try:
+            f = open(part, "r")
+        except FileNotFoundError:
+            if os.path.exists(path):
+                # already complete (or restored from the stage cache)
+                yield from read_jsonl(path)
+                return
+            time.sleep(poll_seconds)
+
+    with f:
+        pending = ""
+        while True:
+            # checked before reading: whatever was written before the rename
+            # is read below, so no line is lost
+            finished = os.path.exists(path)
+            if os.path.exists(failed):
+                raise RuntimeError(f"writer of {path} failed")
+
+            pending += f.read()
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+            if finished:
+                if pending.strip():
+                    yield json.loads(pending)
+                return
+            if not lines:
+                time.sleep(poll_seconds)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# Bump when a stage's output format or logic changes → invalidates that stage
+STAGE_VERSIONS = {
+    "extract": "1",
+    "transcribe": "1",
+    "timeline": "1",
+    "audio_emotion": "1",
+}
+
+HASH_CHUNK = 1 << 20
+
+
+def _atomic_copy(source, target):
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def _atomic_write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class StageCache:
+    # Layout under `root`:
+    #   manifest.json          path → {size, mtime_ns, sha256}  (hash memo)
+    #   <stage>/<key>.json     {"files": {name: file}, "params": {...}}
+    #   <stage>/<key>/<file>   stored copy of each output
+    # One file per entry, so worker processes can record results without
+    # contending on a shared manifest.
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        os.makedirs(root, exist_ok=True)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    # ---------------- INPUT HASHING ----------------
+    def file_hash(self, path):
+        st = os.stat(path)
+        abs_path = os.path.abspath(path)
+
+        memo = self.manifest.get(abs_path)
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+
+        digest = h.hexdigest()
+        with self._lock:
+            self.manifest[abs_path] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": digest,
+            }
+            self._dirty = True
+
+        return digest
+
+    def save(self):
+        with self._lock:
+            if self._dirty:
+                _atomic_write_json(self.manifest_path, self.manifest)
+                self._dirty = False
+
+    # ---------------- STAGE ENTRIES ----------------
+    @staticmethod
+    def key(stage, input_key, **params):
+        payload = json.dumps(
+            {
+                "stage": stage,
+                "version": STAGE_VERSIONS.get(stage, "1"),
+                "input": input_key,
+                "params": params,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_path(self, stage, key):
+        return os.path.join(self.root, stage, f"{key}.json")
+
+    def _store_dir(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def get(self, stage, key):
+        path = self._entry_path(stage, key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            entry = json.load(f)
+
+        # entries that only point at live output paths (written before outputs
+        # were stored in the cache) can't tell whose content is there → miss
+        if "files" not in entry:
+            return None
+
+        store = self._store_dir(stage, key)
+        entry["outputs"] = {name: os.path.join(store, file) for name, file in entry["files"].items()}
+
+        # stale if any stored copy was deleted
+        if not all(os.path.exists(p) for p in entry["outputs"].values()):
+            return None
+
+        return entry
+
+    def put(self, stage, key, outputs, **params):
+        # Outputs are copied into <root>/<stage>/<key>/, so a later run with
+        # other parameters overwriting the live files can't change what this
+        # key restores. (Copies, not hardlinks: outputs are rewritten in place.)
+        store = self._store_dir(stage, key)
+        os.makedirs(store, exist_ok=True)
+
+        files = {}
+        for name, path in outputs.items():
+            file = name + os.path.splitext(path)[1]
+            _atomic_copy(path, os.path.join(store, file))
+            files[name] = file
+
+        # entry last → it only exists once every output is stored
+        _atomic_write_json(
+            self._entry_path(stage, key),
+            {"files": files, "params": params},
+        )
+
+    def restore(self, stage, key, targets):
+        # Copy cached outputs to `targets` ({name: path}); also covers a
+        # renamed but identical video whose artifacts live under another name.
+        entry = self.get(stage, key)
+        if entry is None:
+            return False
+
+        if any(name not in entry["outputs"] for name in targets):
+            return False
+
+        for name, target in targets.items():
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            _atomic_copy(entry["outputs"][name], target)
+
+        return True
@@ -1,22 +1,338 @@
 from faster_whisper import WhisperModel
+from concurrent.futures import ProcessPoolExecutor
+from rapidfuzz import fuzz
 import json
 import os
+import re
 
-def transcribe(audio_path, out_path):
-    model = WhisperModel("base", device="cpu", compute_type="int8")
-    segments, _ = model.transcribe(audio_path)
+from pipeline.pause_detection import stream_timeline, tee_jsonl
+from pipeline.vad import SAMPLE_RATE as VAD_SAMPLE_RATE, VoicedAudio, silence_intervals, voiced_regions
 
-    transcript = []
+# ---------------- CONFIG ----------------
+MODEL_SIZE = os.getenv("WHISPER_MODEL", "base")
+DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+# parallel chunked mode: target chunk length, how far from each target cut
+# to look for a silence, and the overlap used when none is found
+CHUNK_SECONDS = float(os.getenv("WHISPER_CHUNK_SECONDS", "120"))
+CHUNK_SEARCH_SECONDS = 20.0
+CHUNK_OVERLAP_SECONDS = 2.0
+# two time-overlapping segments from neighbouring chunks are one line when
+# the shorter text matches part of the longer this well (partial_ratio, 0-100)
+CHUNK_DEDUP_MIN_SCORE = 90
+# ----------------------------------------
+
+# one model per (size, device, compute type), per process
+_models = {}
+_worker_config = None
+
+
+def get_whisper_model(model_size=MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE):
+    key = (model_size, device, compute_type)
+
+    if key not in _models:
+        _models[key] = WhisperModel(model_size, device=device, compute_type=compute_type)
+
+    return _models[key]
+
+
+def _resolve_model(model_size=None, device=None, compute_type=None):
+    # inside a TranscriptionService worker, default to the preloaded model
+    config = _worker_config or (MODEL_SIZE, DEVICE, COMPUTE_TYPE)
+    return get_whisper_model(
+        model_size or config[0],
+        device or config[1],
+        compute_type or config[2],
+    )
+
+
+def iter_segments(audio, model_size=None, device=None, compute_type=None, regions=None):
+    # `audio` is a file path or a 16 kHz mono float32 buffer (see load_audio).
+    # With `regions` (voiced (start, end) pairs, see detect_speech) only those
+    # parts of the buffer are transcribed; timestamps stay in track time.
+    model = _resolve_model(model_size, device, compute_type)
+
+    voiced = None
+    if regions is not None:
+        voiced = VoicedAudio(audio, regions)
+        if not len(voiced.audio):
+            return
+        audio = voiced.audio
+
+    segments, _ = model.transcribe(audio)
+
+    # faster-whisper decodes lazily → segments are yielded as they are produced
     for seg in segments:
-        transcript.append({
+        start, end = seg.start, seg.end
+        if voiced is not None:
+            start, end = voiced.to_source(start), voiced.to_source(end)
+
+        yield {
             "text": seg.text,
-            "start": seg.start,
-            "end": seg.end
-        })
+            "start": start,
+            "end": end
+        }
+
+
+def _as_buffer(audio):
+    if isinstance(audio, str):
+        from pipeline.extract_audio import load_audio
+
+        audio = load_audio(audio, sr=VAD_SAMPLE_RATE)
+    return audio
+
+
+def detect_speech(audio, vad_path=None):
+    # Energy VAD over the decoded track → (16 kHz buffer, voiced regions,
+    # {"duration", "voiced", "silences"}), the latter also saved to vad_path
+    audio = _as_buffer(audio)
+
+    duration = len(audio) / VAD_SAMPLE_RATE
+    regions = voiced_regions(audio)
+    speech = {
+        "duration": round(duration, 3),
+        "voiced": regions,
+        "silences": silence_intervals(regions, duration),
+    }
+
+    if vad_path:
+        with open(vad_path, "w") as f:
+            json.dump(speech, f)
+
+    voiced_seconds = sum(end - start for start, end in regions)
+    print(f"🔇 VAD: {voiced_seconds:.0f}s of {duration:.0f}s voiced "
+          f"({len(regions)} regions) → only those are transcribed")
+    return audio, regions, speech
+
+
+def _segments(audio, model_size, device, compute_type, regions, silences, pool, chunk_seconds):
+    if pool is None:
+        return iter_segments(audio, model_size, device, compute_type, regions)
+
+    # chunks run on the pool's workers with their preloaded model
+    return iter_segments_parallel(_as_buffer(audio), pool, chunk_seconds, regions, silences)
+
+
+def transcribe(audio, out_path, model_size=None, device=None, compute_type=None,
+               vad_path=None, pool=None, chunk_seconds=CHUNK_SECONDS):
+    # vad_path set → skip dead air (see detect_speech) and save the measured
+    # silences there for the timeline stage
+    # pool set → split at silences and transcribe the chunks concurrently
+    # (see iter_segments_parallel)
+    regions, silences = None, None
+    if vad_path:
+        audio, regions, speech = detect_speech(audio, vad_path)
+        silences = speech["silences"]
+
+    transcript = list(_segments(
+        audio, model_size, device, compute_type, regions, silences, pool, chunk_seconds
+    ))
 
     with open(out_path, "w") as f:
         json.dump(transcript, f, indent=2)
 
+    return out_path
+
+
+def transcribe_to_timeline(audio, transcript_path, timeline_path,
+                           model_size=None, device=None, compute_type=None,
+                           vad_path=None, pool=None, chunk_seconds=CHUNK_SECONDS):
+    # Streaming mode: Whisper segments → pause detection → JSONL, one segment
+    # at a time, so memory stays flat however long the film is. Transcript
+    # and timeline are written to "<path>.part" and renamed when complete:
+    # a reader can tail the transcript meanwhile (pause_detection.follow_jsonl)
+    # and nothing ever sees a partial file under the final name.
+    partial_path = timeline_path + ".part"
+
+    regions, end_time, silences = None, None, None
+    if vad_path:
+        audio, regions, speech = detect_speech(audio, vad_path)
+        end_time, silences = speech["duration"], speech["silences"]
+
+    segments = _segments(
+        audio, model_size, device, compute_type, regions, silences, pool, chunk_seconds
+    )
+    segments = tee_jsonl(segments, transcript_path + ".part")
+
+    count = 0
+    for _ in tee_jsonl(stream_timeline(segments, end_time, silences), partial_path):
+        count += 1
+
+    os.replace(transcript_path + ".part", transcript_path)
+    os.replace(partial_path, timeline_path)
+    return count
+
+
+########################################
+# PARALLEL CHUNKED TRANSCRIPTION
+########################################
+def plan_chunks(duration, silences, chunk_seconds=CHUNK_SECONDS):
+    # → [(start, end, keep_from, keep_to)] in seconds. Each cut goes in the
+    # middle of the longest silence near the next chunk_seconds mark; with
+    # no silence there, neighbours share CHUNK_OVERLAP_SECONDS of audio on
+    # either side of the cut. Each chunk keeps the segments centred in
+    # [keep_from, keep_to), so nothing is kept twice.
+    cuts = []  # (time, overlap)
+    cursor = 0.0
+
+    while duration - cursor > chunk_seconds * 1.25:
+        target = cursor + chunk_seconds
+        # short chunks: never search back past half a chunk, or a silence
+        # just after the previous cut would make a near-empty chunk
+        lo = max(target - CHUNK_SEARCH_SECONDS, cursor + chunk_seconds / 2)
+        hi = target + CHUNK_SEARCH_SECONDS
+
+        best = None
+        for start, end in silences:
+            if start >= hi:
+                break
+            start, end = max(start, lo, cursor), min(end, hi)
+            if end > start and (best is None or end - start > best[1] - best[0]):
+                best = (start, end)
+
+        if best is not None:
+            cuts.append(((best[0] + best[1]) / 2, 0.0))
+        else:
+            cuts.append((target, CHUNK_OVERLAP_SECONDS))
+        cursor = cuts[-1][0]
+
+    bounds = [(0.0, 0.0)] + cuts + [(duration, 0.0)]
+    chunks = []
+    for i, ((a, a_overlap), (b, b_overlap)) in enumerate(zip(bounds, bounds[1:])):
+        chunks.append((
+            max(a - a_overlap, 0.0),
+            min(b + b_overlap, duration),
+            a if i > 0 else float("-inf"),
+            b if i < len(cuts) else float("inf"),
+        ))
+    return chunks
+
+
+def transcribe_chunk(audio, offset, regions=None):
+    # runs in a pool worker: one chunk → its segments in track time
+    return [
+        {**seg, "start": seg["start"] + offset, "end": seg["end"] + offset}
+        for seg in iter_segments(audio, regions=regions)
+    ]
+
+
+def _clip_regions(regions, start, end):
+    # voiced regions inside [start, end], relative to start
+    return [
+        (max(a, start) - start, min(b, end) - start)
+        for a, b in regions
+        if b > start and a < end
+    ]
+
+
+def _normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", "", text.lower()).split())
+
+
+def _same_line(a, b):
+    # True when a and b are copies of one spoken line from either side of a
+    # chunk cut: they overlap in time and one text is (nearly) the other or
+    # a cut-off prefix / suffix of it
+    if a["start"] >= b["end"] or b["start"] >= a["end"]:
+        return False
+
+    shorter, longer = sorted((_normalize_text(a["text"]), _normalize_text(b["text"])), key=len)
+    if not shorter:
+        return True
+    return longer.startswith(shorter) or longer.endswith(shorter) or (
+        fuzz.partial_ratio(shorter, longer) >= CHUNK_DEDUP_MIN_SCORE
+    )
+
+
+def iter_segments_parallel(audio, pool, chunk_seconds=CHUNK_SECONDS, regions=None,
+                           silences=None):
+    # Long track → chunks cut at silences (see plan_chunks), all submitted
+    # to `pool` (a TranscriptionService pool) at once. Segments are yielded
+    # in order, each chunk's as soon as it and every earlier chunk are done.
+    sr = VAD_SAMPLE_RATE
+    duration = len(audio) / sr
+    if silences is None:
+        silences = silence_intervals(voiced_regions(audio, sr), duration)
+
+    chunks = plan_chunks(duration, silences, chunk_seconds)
+    futures = [
+        pool.submit(
+            transcribe_chunk,
+            audio[int(start * sr):int(end * sr)],
+            start,
+            None if regions is None else _clip_regions(regions, start, end),
+        )
+        for start, end, _, _ in chunks
+    ]
+    print(f"🧩 {duration:.0f}s split into {len(chunks)} chunks for parallel transcription")
+
+    # one segment is held back so a line cut short by a chunk edge can be
+    # completed by the next chunk's copy of it
+    held = None
+    try:
+        for future, (_, _, keep_from, keep_to) in zip(futures, chunks):
+            for seg in future.result():
+                if not keep_from <= (seg["start"] + seg["end"]) / 2 < keep_to:
+                    continue
+
+                # the same line heard by both chunks around an overlapping cut
+                # (possibly cut short in one of them) → one segment spanning
+                # both, with the fuller text
+                if held is not None and _same_line(held, seg):
+                    if len(seg["text"].strip()) > len(held["text"].strip()):
+                        held["text"] = seg["text"]
+                    held["start"] = min(held["start"], seg["start"])
+                    held["end"] = max(held["end"], seg["end"])
+                    continue
+
+                if held is not None:
+                    yield held
+                held = seg
+
+        if held is not None:
+            yield held
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+########################################
+# LONG-LIVED TRANSCRIPTION SERVICE
+########################################
+def _init_worker(model_size, device, compute_type):
+    global _worker_config
+    _worker_config = (model_size, device, compute_type)
+
+    # pay the model load once, when the worker starts
+    get_whisper_model(model_size, device, compute_type)
+
+
+class TranscriptionService:
+    def __init__(self, workers=1, model_size=MODEL_SIZE, device=DEVICE,
+                 compute_type=COMPUTE_TYPE):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_size, device, compute_type),
+        )
+
+    def submit(self, audio_path, out_path):
+        return self.pool.submit(transcribe, audio_path, out_path)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
 
 if __name__ == "__main__":
     os.makedirs("outputs", exist_ok=True)
@@ -0,0 +1,156 @@
+import os
+import numpy as np
+
+# Energy-based voice activity detection on the decoded waveform: frame RMS in
+# dBFS against an adaptive threshold, then hangover / minimum-length rules.
+# Everything is vectorised (per-hop energies, run boundaries from np.diff),
+# so a two-hour film takes well under a second.
+
+# ---------------- CONFIG ----------------
+SAMPLE_RATE = 16000
+
+FRAME_SECONDS = 0.030
+HOP_SECONDS = 0.010
+
+# a frame is voiced above noise floor + MARGIN_DB (the noise floor being the
+# NOISE_PERCENTILE-th percentile of frame levels), but never above
+# DYNAMIC_RANGE_DB below the loud end (tracks that are nearly all speech) nor
+# below ABS_FLOOR_DB
+ABS_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-50"))
+MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+DYNAMIC_RANGE_DB = float(os.getenv("VAD_DYNAMIC_RANGE_DB", "30"))
+NOISE_PERCENTILE = 10
+LOUD_PERCENTILE = 95
+
+SPEECH_PAD_SECONDS = 0.25    # keep this much audio either side of speech
+MIN_SILENCE_SECONDS = 0.5    # shorter gaps are bridged
+MIN_SPEECH_SECONDS = 0.15    # shorter blips are dropped
+
+# silence put between voiced regions when they are concatenated for Whisper
+REGION_GAP_SECONDS = 0.3
+# ----------------------------------------
+
+
+def frame_levels(audio, sr=SAMPLE_RATE, frame_seconds=FRAME_SECONDS, hop_seconds=HOP_SECONDS):
+    # → RMS level of every frame in dBFS (frame i starts at i * hop). Energy
+    # is summed per hop once (einsum, no squared copy of the track), and a
+    # frame is a run of whole hops, so no sample is touched twice.
+    hop = max(1, int(hop_seconds * sr))
+    hops_per_frame = max(1, int(round(frame_seconds / hop_seconds)))
+
+    n_hops = len(audio) // hop
+    if n_hops < hops_per_frame:
+        return np.zeros(0, dtype="float32")
+
+    blocks = np.asarray(audio[:n_hops * hop], dtype="float32").reshape(n_hops, hop)
+    hop_energy = np.einsum("ij,ij->i", blocks, blocks, dtype="float64")
+
+    cumulative = np.concatenate([[0.0], np.cumsum(hop_energy)])
+    energy = (cumulative[hops_per_frame:] - cumulative[:-hops_per_frame]) / (hops_per_frame * hop)
+
+    return (10 * np.log10(np.maximum(energy, 1e-10))).astype("float32")
+
+
+def _runs(mask):
+    # → (starts, ends) of the True runs in a boolean array, ends exclusive
+    edges = np.diff(np.concatenate([[0], mask.astype("int8"), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def voice_threshold(levels):
+    # → dBFS level above which a frame counts as voiced. The loud-end cap keeps
+    # tracks that are nearly all speech from lifting the percentile noise floor
+    # up to speech level.
+    noise, loud = np.percentile(levels, [NOISE_PERCENTILE, LOUD_PERCENTILE])
+    return max(ABS_FLOOR_DB, min(noise + MARGIN_DB, loud - DYNAMIC_RANGE_DB))
+
+
+def voiced_regions(audio, sr=SAMPLE_RATE):
+    # → [(start, end)] in seconds where someone is (probably) talking
+    levels = frame_levels(audio, sr)
+    if not len(levels):
+        return []
+
+    starts, ends = _runs(levels > voice_threshold(levels))
+    if not len(starts):
+        return []
+
+    # frame indices → seconds, padded on both sides
+    starts = np.maximum(starts * HOP_SECONDS - SPEECH_PAD_SECONDS, 0.0)
+    ends = np.minimum(
+        (ends - 1) * HOP_SECONDS + FRAME_SECONDS + SPEECH_PAD_SECONDS, len(audio) / sr
+    )
+
+    # bridge short gaps: a new region begins only after a long enough silence
+    new_region = np.concatenate([[True], starts[1:] - ends[:-1] >= MIN_SILENCE_SECONDS])
+    merged_starts = starts[new_region]
+    merged_ends = np.maximum.reduceat(ends, np.flatnonzero(new_region))
+
+    keep = merged_ends - merged_starts >= MIN_SPEECH_SECONDS
+    return [
+        (round(float(s), 3), round(float(e), 3))
+        for s, e in zip(merged_starts[keep], merged_ends[keep])
+    ]
+
+
+def silence_intervals(regions, duration):
+    # complement of the voiced regions over [0, duration]
+    silences = []
+    cursor = 0.0
+
+    for start, end in regions:
+        if start - cursor >= MIN_SILENCE_SECONDS:
+            silences.append((round(cursor, 3), round(start, 3)))
+        cursor = max(cursor, end)
+
+    if duration - cursor >= MIN_SILENCE_SECONDS:
+        silences.append((round(cursor, 3), round(duration, 3)))
+
+    return silences
+
+
+class VoicedAudio:
+    # The voiced regions of a track cut out and joined (with a short gap so
+    # Whisper still sees a pause), plus the mapping back to source time.
+    def __init__(self, audio, regions, sr=SAMPLE_RATE, gap_seconds=REGION_GAP_SECONDS):
+        self.sr = sr
+        gap = np.zeros(int(gap_seconds * sr), dtype=audio.dtype)
+
+        pieces = []
+        self.concat_starts = []   # where each region begins in the joined audio
+        self.source_starts = []   # ... and in the original track
+        self.lengths = []
+        offset = 0
+
+        for start, end in regions:
+            a, b = int(start * sr), min(int(end * sr), len(audio))
+            if b <= a:
+                continue
+            if pieces:
+                pieces.append(gap)
+                offset += len(gap)
+
+            pieces.append(audio[a:b])
+            self.concat_starts.append(offset / sr)
+            self.source_starts.append(a / sr)
+            self.lengths.append((b - a) / sr)
+            offset += b - a
+
+        self.audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=audio.dtype)
+        self.concat_starts = np.array(self.concat_starts)
+        self.source_starts = np.array(self.source_starts)
+        self.lengths = np.array(self.lengths)
+
+    @property
+    def duration(self):
+        return len(self.audio) / self.sr
+
+    def to_source(self, t):
+        # joined-audio time → original time; times inside a gap snap to the
+        # end of the region before it
+        if not len(self.concat_starts):
+            return float(t)
+
+        i = max(int(np.searchsorted(self.concat_starts, t, side="right")) - 1, 0)
+        into = min(max(t - self.concat_starts[i], 0.0), self.lengths[i])
+        return float(self.source_starts[i] + into)
@@ -1,10 +1,30 @@
 import os
+import sys
 import json
-import subprocess
+import shutil
+import argparse
+import functools
 
-from pipeline.extract_audio import extract_audio
-from pipeline.transcribe_audio import transcribe
-from pipeline.pause_detection import detect_silence_from_transcript
+from pipeline.extract_audio import SAMPLE_RATE, load_audio
+from pipeline.transcribe_audio import (
+    CHUNK_SECONDS,
+    MODEL_SIZE,
+    COMPUTE_TYPE,
+    TranscriptionService,
+    transcribe,
+    transcribe_to_timeline,
+)
+from pipeline.pause_detection import (
+    detect_silence_from_transcript,
+    follow_jsonl,
+    mark_failed,
+    read_jsonl,
+    reset_follow,
+    stream_timeline,
+    tee_jsonl,
+)
+from pipeline.stage_cache import StageCache
+from pipeline.executor import Stage, IO_STAGE, CPU_STAGE, run_pipeline
 
 # ---------------- CONFIG ----------------
 DATA_DIR = "data"
@@ -13,78 +33,467 @@ OUTPUTS_DIR = "outputs"
 SEMANTIC_DIR = "semantic-transcript-search"
 TRANSCRIPTS_DIR = os.path.join(SEMANTIC_DIR, "transcripts")
 
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Keras model for --audio-emotion (pipeline/audio_emotion_features.py)
+EMOTION_MODEL_PATH = os.path.join("models", "model3_2.h5")
+
 # ----------------------------------------
 
 os.makedirs(OUTPUTS_DIR, exist_ok=True)
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
 
+# content-hash cache: outputs/.cache/{manifest.json, <stage>/<key>.json}
+STAGE_CACHE = StageCache(os.path.join(OUTPUTS_DIR, ".cache"))
+
+
+# ---------------- STAGES ----------------
+def stage_keys(video_hash, options):
+    # each stage is keyed on its input's key plus its own parameters
+    fmt = "jsonl" if options["stream"] else "json"
+
+    extract_key = StageCache.key("extract", video_hash, writer="ffmpeg", sr=SAMPLE_RATE)
+    transcribe_key = StageCache.key(
+        "transcribe",
+        video_hash,
+        model=options["model_size"],
+        compute_type=options["compute_type"],
+        format=fmt,
+        vad=options["vad"],
+        chunk_seconds=options["chunk_seconds"],
+    )
+    timeline_key = StageCache.key("timeline", transcribe_key, format=fmt)
+    audio_emotion_key = StageCache.key(
+        "audio_emotion", transcribe_key, model=EMOTION_MODEL_PATH, format=fmt
+    )
+
+    return {
+        "extract": extract_key,
+        "transcribe": transcribe_key,
+        "timeline": timeline_key,
+        "audio_emotion": audio_emotion_key,
+    }
+
 
-def process_video(video_file):
+def prepare_job(video_file, options):
     video_name = os.path.splitext(video_file)[0]
     video_path = os.path.join(DATA_DIR, video_file)
-
-    print(f"\n🎬 Processing video: {video_file}")
+    ext = ".jsonl" if options["stream"] else ".json"
 
     # per-video output dir
     video_out_dir = os.path.join(OUTPUTS_DIR, video_name)
+
+    job = {
+        "video_file": video_file,
+        "video_name": video_name,
+        "video_path": video_path,
+        # WAV on disk is opt-in; otherwise audio is decoded in memory
+        "audio_path": (
+            os.path.join(video_out_dir, "audio.wav") if options["write_wav"] else None
+        ),
+        "transcript_path": os.path.join(video_out_dir, "transcript" + ext),
+        "timeline_path": os.path.join(video_out_dir, "timeline" + ext),
+        "semantic_timeline": os.path.join(
+            TRANSCRIPTS_DIR, f"{video_name}_timeline" + ext
+        ),
+        "audio_emotion_path": os.path.join(video_out_dir, "audio_emotion_segments" + ext),
+        "audio_emotion": options["audio_emotion"],
+        # measured silences from the energy VAD (only with --vad)
+        "vad_path": os.path.join(video_out_dir, "vad.json") if options["vad"] else None,
+        "chunk_seconds": options["chunk_seconds"],
+        "keys": stage_keys(STAGE_CACHE.file_hash(video_path), options),
+        "force": options["force"],
+    }
+
+    # 🔥 SKIP ONLY IF THIS EXACT CONTENT + PARAMS WAS ALREADY PROCESSED
+    if not job["force"] and STAGE_CACHE.restore(
+        "timeline", job["keys"]["timeline"], timeline_outputs(job)
+    ) and (not job["audio_emotion"] or STAGE_CACHE.restore(
+        "audio_emotion", job["keys"]["audio_emotion"], audio_emotion_outputs(job)
+    )):
+        drop_other_timeline_format(job)
+        print(f"⏭️ Skipping {video_file} (cached)")
+        return None
+
     os.makedirs(video_out_dir, exist_ok=True)
+    if options["stream"]:
+        # the audio emotion stage tails this run's transcript, not an old one
+        reset_follow(job["transcript_path"])
+
+    print(f"\n🎬 Processing video: {video_file}")
+    return job
+
+
+def timeline_outputs(job):
+    return {"timeline": job["timeline_path"], "semantic": job["semantic_timeline"]}
+
+
+def drop_other_timeline_format(job):
+    # --stream publishes X_timeline.jsonl, the default mode X_timeline.json;
+    # only the one just published may stay, or build_shots would see two
+    # timelines for one video
+    path = job["semantic_timeline"]
+    other = path[:-1] if path.endswith(".jsonl") else path + "l"
+    if os.path.exists(other):
+        os.remove(other)
+
+
+def transcribe_outputs(job):
+    targets = {"transcript": job["transcript_path"]}
+    if job["vad_path"]:
+        targets["vad"] = job["vad_path"]
+    return targets
+
+
+def read_vad(job):
+    # → (video_end_time, silences) for stream_timeline; (None, None) without VAD
+    if not job["vad_path"]:
+        return None, None
 
-    audio_path = os.path.join(video_out_dir, "audio.wav")
-    transcript_path = os.path.join(video_out_dir, "transcript.json")
-    timeline_path = os.path.join(video_out_dir, "timeline.json")
+    with open(job["vad_path"]) as f:
+        speech = json.load(f)
+    return speech["duration"], speech["silences"]
 
-    if os.path.exists(timeline_path):
-        print(f"⏭️ Skipping {video_file} (already processed)")
-        return
-    # 1️⃣ Extract audio
-    extract_audio(video_path, audio_path)
 
-    # 2️⃣ Transcribe
-    transcribe(audio_path, transcript_path)
+def audio_emotion_outputs(job):
+    return {"segments": job["audio_emotion_path"]}
 
+
+def cached(job, stage, targets):
+    return not job["force"] and STAGE_CACHE.restore(stage, job["keys"][stage], targets)
+
+
+def job_audio(job):
+    if job["audio_path"]:
+        return job["audio_path"]
+
+    # decode the audio track straight into a 16 kHz float32 buffer
+    return load_audio(job["video_path"])
+
+
+def extract_stage(job):
+    # 1️⃣ Extract audio (only with --write-wav)
+    if cached(job, "extract", {"audio": job["audio_path"]}):
+        return job
+
+    # same in-memory decode as without --write-wav, saved as 16 kHz mono PCM
+    load_audio(job["video_path"], wav_path=job["audio_path"])
+    STAGE_CACHE.put("extract", job["keys"]["extract"], {"audio": job["audio_path"]})
+    return job
+
+
+def transcribe_stage(job, pool=None):
+    # 2️⃣ Transcribe (runs inside a TranscriptionService worker → model
+    # preloaded; with --chunk-seconds it runs here and fans chunks out to `pool`)
+    targets = transcribe_outputs(job)
+    if cached(job, "transcribe", targets):
+        return job
+
+    transcribe(
+        job_audio(job), job["transcript_path"],
+        vad_path=job["vad_path"], pool=pool, chunk_seconds=job["chunk_seconds"],
+    )
+    STAGE_CACHE.put("transcribe", job["keys"]["transcribe"], targets)
+    return job
+
+
+def timeline_stage(job):
     # 3️⃣ Generate timeline
-    with open(transcript_path) as f:
+    with open(job["transcript_path"]) as f:
         transcript = json.load(f)
 
-    timeline = detect_silence_from_transcript(transcript)
+    timeline = detect_silence_from_transcript(transcript, *read_vad(job))
 
-    with open(timeline_path, "w") as f:
+    with open(job["timeline_path"], "w") as f:
         json.dump(timeline, f, indent=2)
 
     # 4️⃣ Push timeline into semantic pipeline
-    semantic_timeline = os.path.join(
-        TRANSCRIPTS_DIR, f"{video_name}_timeline.json"
+    with open(job["semantic_timeline"], "w") as f:
+        json.dump(timeline, f, indent=2)
+    drop_other_timeline_format(job)
+
+    STAGE_CACHE.put("timeline", job["keys"]["timeline"], timeline_outputs(job))
+
+    print(f"✅ Timeline ready for semantic search: {job['semantic_timeline']}")
+    return job
+
+
+def stream_transcribe_stage(job, pool=None):
+    # 2️⃣+3️⃣ Transcribe and build the timeline in one pass → JSONL. The
+    # transcript is tailed by the audio emotion stage while it is written.
+    targets = transcribe_outputs(job)
+
+    try:
+        if cached(job, "transcribe", targets):
+            # transcript unchanged → only re-run pause detection over it
+            partial_path = job["timeline_path"] + ".part"
+            segments = read_jsonl(job["transcript_path"])
+            for _ in tee_jsonl(stream_timeline(segments, *read_vad(job)), partial_path):
+                pass
+            os.replace(partial_path, job["timeline_path"])
+            return job
+
+        transcribe_to_timeline(
+            job_audio(job), job["transcript_path"], job["timeline_path"],
+            vad_path=job["vad_path"], pool=pool, chunk_seconds=job["chunk_seconds"],
+        )
+    except BaseException:
+        # a reader tailing the transcript stops instead of waiting forever
+        mark_failed(job["transcript_path"])
+        raise
+
+    STAGE_CACHE.put("transcribe", job["keys"]["transcribe"], targets)
+    return job
+
+
+def publish_timeline_stage(job):
+    # 4️⃣ Push the finished JSONL timeline into the semantic pipeline
+    shutil.copyfile(job["timeline_path"], job["semantic_timeline"])
+    drop_other_timeline_format(job)
+    STAGE_CACHE.put("timeline", job["keys"]["timeline"], timeline_outputs(job))
+
+    print(f"✅ Timeline ready for semantic search: {job['semantic_timeline']}")
+    return job
+
+
+def read_transcript(path):
+    if path.endswith(".jsonl"):
+        return list(read_jsonl(path))
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def audio_emotion_stage(job):
+    # 5️⃣ Segment-level audio emotion (runs in a pool worker → Keras model
+    # loaded once per worker, whole-track mel, batched predict)
+    from pipeline.audio_emotion_features import (
+        SAMPLE_RATE as EMOTION_SAMPLE_RATE,
+        analyze_audio_emotions,
     )
 
-    with open(semantic_timeline, "w") as f:
-        json.dump(timeline, f, indent=2)
+    targets = audio_emotion_outputs(job)
+    if cached(job, "audio_emotion", targets):
+        return job
+
+    audio = load_audio(job["audio_path"] or job["video_path"], sr=EMOTION_SAMPLE_RATE)
+    results = analyze_audio_emotions(
+        audio,
+        read_transcript(job["transcript_path"]),
+        job["audio_emotion_path"],
+        model_path=EMOTION_MODEL_PATH,
+    )
+    STAGE_CACHE.put("audio_emotion", job["keys"]["audio_emotion"], targets)
+
+    print(f"🎭 {len(results)} segment emotions → {job['audio_emotion_path']}")
+    return job
+
+
+def stream_audio_emotion_stage(job):
+    # 5️⃣ (stream mode) audio decoded block by block, only blocks under a
+    # transcript segment are scored, results appended to JSONL as they come.
+    # Starts together with transcription and follows the transcript as
+    # Whisper writes it.
+    from pipeline.audio_emotion_features import analyze_audio_emotions_streaming
+
+    targets = audio_emotion_outputs(job)
+    if cached(job, "audio_emotion", targets):
+        return job
+
+    count = analyze_audio_emotions_streaming(
+        job["audio_path"] or job["video_path"],
+        follow_jsonl(job["transcript_path"]),
+        job["audio_emotion_path"],
+        model_path=EMOTION_MODEL_PATH,
+    )
+    STAGE_CACHE.put("audio_emotion", job["keys"]["audio_emotion"], targets)
+
+    print(f"🎭 {count} segment emotions (streamed) → {job['audio_emotion_path']}")
+    return job
+
+
+def build_stages(stream=False, write_wav=False, audio_emotion=False, chunk_pool=None):
+    stages = []
+
+    if write_wav:
+        stages.append(Stage("extract", extract_stage, IO_STAGE))
+
+    transcribe_fn = stream_transcribe_stage if stream else transcribe_stage
+    if chunk_pool is None:
+        transcribe = Stage("transcribe", transcribe_fn, CPU_STAGE)
+    else:
+        # chunked: planned and stitched in this process, chunks on the workers
+        transcribe = Stage(
+            "transcribe", functools.partial(transcribe_fn, pool=chunk_pool), IO_STAGE
+        )
+
+    if stream:
+        stages.append(transcribe)
+        if audio_emotion:
+            # starts with transcription and tails its transcript; not with
+            # chunking, where it would hold a pool worker the chunks need
+            stages.append(Stage(
+                "audio_emotion", stream_audio_emotion_stage, CPU_STAGE,
+                follows=chunk_pool is None,
+            ))
+        stages.append(Stage("publish", publish_timeline_stage, IO_STAGE))
+        return stages
+
+    stages += [transcribe, Stage("timeline", timeline_stage, IO_STAGE)]
+    if audio_emotion:
+        stages.append(Stage("audio_emotion", audio_emotion_stage, CPU_STAGE))
+
+    return stages
+
+# ----------------------------------------
 
-    print(f"✅ Timeline ready for semantic search: {semantic_timeline}")
+
+def make_options(model_size=MODEL_SIZE, compute_type=COMPUTE_TYPE,
+                 stream=False, write_wav=False, force=False, audio_emotion=False,
+                 vad=False, chunk_seconds=0):
+    return {
+        "model_size": model_size,
+        "compute_type": compute_type,
+        "stream": stream,
+        "write_wav": write_wav,
+        "force": force,
+        "audio_emotion": audio_emotion,
+        "vad": vad,
+        "chunk_seconds": chunk_seconds,
+    }
+
+
+def chunk_pool(service, options):
+    # --chunk-seconds: one video's chunks are spread over the whole pool
+    return service.pool if options["chunk_seconds"] else None
+
+
+def process_videos(video_files, workers=DEFAULT_WORKERS, options=None):
+    options = options or make_options()
+
+    try:
+        with TranscriptionService(
+            workers=max(1, workers),
+            model_size=options["model_size"],
+            compute_type=options["compute_type"],
+        ) as service:
+            # workers == 1 goes through the same scheduler → one failing video
+            # doesn't stop the batch, and the summary is always printed
+            result = run_pipeline(
+                video_files,
+                functools.partial(prepare_job, options=options),
+                build_stages(
+                    options["stream"], options["write_wav"], options["audio_emotion"],
+                    chunk_pool(service, options),
+                ),
+                cpu_pool=service.pool,
+                workers=max(1, workers),
+            )
+    finally:
+        STAGE_CACHE.save()
+
+    print("\n" + result.summary())
+    return result
 
 
 def run_semantic_pipeline():
+    # Runs in this process: build_shots and ingest share one semantic_search
+    # module, so the embedding model and LLM client are loaded only once.
+    semantic_dir = os.path.abspath(SEMANTIC_DIR)
+    if semantic_dir not in sys.path:
+        sys.path.insert(0, semantic_dir)
+
+    from build_shots import build_shots
+    from semantic_search import ingest_shots_folder
+
     print("\n🧠 Building shots...")
-    subprocess.run(
-        ["python", "build_shots.py"],
-        cwd=SEMANTIC_DIR,
-        check=True
-    )
+    build_shots()
 
     print("\n📦 Indexing shots into FAISS...")
-    subprocess.run(
-        ["python", "-c",
-         "from semantic_search import ingest_shots_folder; ingest_shots_folder()"],
-        cwd=SEMANTIC_DIR,
-        check=True
+    ingest_shots_folder()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the full video → search pipeline")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="process-pool size for CPU stages (1 = serial)",
     )
+    parser.add_argument(
+        "--whisper-model",
+        default=MODEL_SIZE,
+        help="faster-whisper model size (loaded once per worker)",
+    )
+    parser.add_argument(
+        "--compute-type",
+        default=COMPUTE_TYPE,
+        help="CTranslate2 compute type, e.g. int8, int8_float32, float32",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream Whisper segments straight into a JSONL timeline",
+    )
+    parser.add_argument(
+        "--write-wav",
+        action="store_true",
+        help="also write outputs/<video>/audio.wav (default: decode in memory)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="ignore the stage cache and recompute every stage",
+    )
+    parser.add_argument(
+        "--audio-emotion",
+        action="store_true",
+        help=f"also score per-segment audio emotion with {EMOTION_MODEL_PATH} "
+             "(with --stream: block-wise decode, constant memory, JSONL output)",
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="energy VAD before Whisper: transcribe voiced regions only, "
+             "timeline silences from the waveform",
+    )
+    parser.add_argument(
+        "--chunk-seconds",
+        type=float,
+        nargs="?",
+        const=CHUNK_SECONDS,
+        default=0,
+        help=f"split long audio at silences into ~N s chunks transcribed in "
+             f"parallel across the workers (default N={CHUNK_SECONDS:g}; off when omitted)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+
     print("\n🚀 STARTING FULL PIPELINE")
 
-    for file in os.listdir(DATA_DIR):
-        if file.lower().endswith(".mp4"):
-            process_video(file)
+    videos = sorted(
+        file for file in os.listdir(DATA_DIR)
+        if file.lower().endswith(".mp4")
+    )
+
+    process_videos(
+        videos,
+        workers=args.workers,
+        options=make_options(
+            model_size=args.whisper_model,
+            compute_type=args.compute_type,
+            stream=args.stream,
+            write_wav=args.write_wav,
+            force=args.force,
+            audio_emotion=args.audio_emotion,
+            vad=args.vad,
+            chunk_seconds=args.chunk_seconds,
+        ),
+    )
 
     run_semantic_pipeline()
 
@@ -1,6 +1,6 @@
 import os
 import streamlit as st
-from semantic_search import load_or_create_faiss, semantic_search
+from semantic_search import LiveSearchIndex, get_embedding_model
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -132,9 +132,16 @@ div[data-baseweb="input"] input:focus {
 )
 
 # --------------------------------------------------
-# LOAD FAISS
+# SHARED RESOURCES (once per process, not per rerun / session)
 # --------------------------------------------------
-index, metadata = load_or_create_faiss()
+@st.cache_resource
+def load_search_index():
+    # warm the encoder here so the first query doesn't pay for it
+    get_embedding_model()
+    return LiveSearchIndex()
+
+
+search_index = load_search_index()
 
 # --------------------------------------------------
 # FIXED HEADER (TITLE + TAGLINE + SEARCH)
@@ -189,7 +196,8 @@ if not query:
     st.stop()
 
 # ---------------- RESULTS STATE ----------------
-results = semantic_search(query, index, metadata, k=1)
+# picks up a re-ingested index automatically
+results = search_index.search(query, k=1)
 
 if not results:
     st.warning("No matching video found")
@@ -197,12 +205,18 @@ else:
     for shot in results:
         source_video = shot.get("source_video", "")
         video_name = os.path.basename(source_video)
+        start_time = shot.get("start_time") or 0.0
+        end_time = shot.get("end_time")
+
+        moment = f"{start_time:.0f}s"
+        if end_time is not None:
+            moment += f" – {end_time:.0f}s"
 
         st.markdown(
             f"""
         <div class="result-card">
             <h3>🎞 {shot.get("shot_id", "Unknown Shot")}</h3>
-            <p><b>Video:</b> {video_name}</p>
+            <p><b>Video:</b> {video_name} &nbsp; <b>Moment:</b> {moment}</p>
             <p>{shot.get("description", "")}</p>
         </div>
         """,
@@ -214,8 +228,15 @@ else:
             video_path = os.path.join("..", video_path)
 
         if video_path and os.path.exists(video_path):
-            st.video(video_path)
+            # start playback at the matching window
+            st.video(video_path, start_time=int(start_time))
         else:
             st.warning(f"Video file not found: {video_path}")
 
+        other_moments = [
+            f"{hit['start_time']:.0f}s" for hit in shot.get("hits", [])[1:]
+        ]
+        if other_moments:
+            st.caption("Also matches at " + ", ".join(other_moments))
+
 st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from encoders import ENCODERS, load_encoder
+from semantic_search import EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE, SHOTS_DIR
+
+# Encoder accuracy-vs-speed benchmark on the shot corpus:
+#
+#   python bench_encoders.py                              # torch, onnx, onnx-int8
+#   python bench_encoders.py --backends torch onnx-int8 --k 1 5 10
+#
+# Throughput = descriptions encoded per second (after a warm-up batch).
+# recall@k = overlap of each query's top-k descriptions with the torch fp32
+# top-k (exact cosine), i.e. how much the ranking drifts from the baseline.
+
+# ---------------- CONFIG ----------------
+BASELINE = "torch"
+QUERY_WORDS = 12  # queries are the first words of each shot's dialogue
+WARMUP_TEXTS = 32
+# ----------------------------------------
+
+
+def load_corpus(shots_dir=SHOTS_DIR):
+    # → (descriptions to index, dialogue-derived queries)
+    descriptions, queries = [], []
+
+    for file in sorted(os.listdir(shots_dir)):
+        if not file.endswith(".json"):
+            continue
+        with open(os.path.join(shots_dir, file), "r") as f:
+            shot = json.load(f)
+
+        dialogue = shot.get("signals", {}).get("dialogue", "")
+        descriptions.append(shot.get("description") or dialogue)
+        if dialogue.strip():
+            queries.append(" ".join(dialogue.split()[:QUERY_WORDS]))
+
+    return descriptions, queries
+
+
+def _normalized(vectors):
+    vectors = np.asarray(vectors, dtype="float32")
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def top_k(queries, corpus, k):
+    scores = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in best]
+
+
+def run_backend(backend, descriptions, queries, batch_size):
+    started = time.perf_counter()
+    model = load_encoder(EMBEDDING_MODEL_NAME, backend)
+    load_seconds = time.perf_counter() - started
+
+    model.encode(descriptions[:WARMUP_TEXTS], batch_size=batch_size, convert_to_numpy=True)
+
+    started = time.perf_counter()
+    corpus = model.encode(descriptions, batch_size=batch_size, convert_to_numpy=True)
+    encode_seconds = time.perf_counter() - started
+
+    query_vecs = model.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+
+    return {
+        "load_s": load_seconds,
+        "texts_per_s": len(descriptions) / encode_seconds if encode_seconds else float("inf"),
+        "corpus": _normalized(corpus),
+        "queries": _normalized(query_vecs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", nargs="+", default=list(ENCODERS))
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 5, 10])
+    parser.add_argument("--shots-dir", default=SHOTS_DIR)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="repeat the corpus N times for steadier throughput")
+    args = parser.parse_args()
+
+    descriptions, queries = load_corpus(args.shots_dir)
+    if not descriptions or not queries:
+        print(f"❌ No shots with dialogue in {args.shots_dir} (run build_shots.py first)")
+        return
+    n_unique = len(descriptions)
+    descriptions = descriptions * args.repeat
+    print(f"📚 {len(descriptions)} descriptions, {len(queries)} queries")
+
+    backends = [BASELINE] + [b for b in args.backends if b != BASELINE]
+    results = {}
+    for backend in backends:
+        try:
+            results[backend] = run_backend(backend, descriptions, queries, args.batch_size)
+        except Exception as e:
+            print(f"⚠️ Skipping {backend}: {e}")
+
+    if BASELINE not in results:
+        print("❌ Baseline (torch fp32) failed to load, nothing to compare against")
+        return
+    # recall / cosine on the unique corpus only (repeats would just tie)
+    for res in results.values():
+        res["corpus"] = res["corpus"][:n_unique]
+
+    base = results[BASELINE]
+    base_top = {k: top_k(base["queries"], base["corpus"], k) for k in args.k}
+
+    header = f"{'backend':<10} {'load s':>7} {'texts/s':>9} {'speedup':>8} {'cos':>6}"
+    header += "".join(f" {'R@' + str(k):>6}" for k in args.k)
+    print(header)
+
+    for backend, res in results.items():
+        # same texts, same model → cosine between backends' vectors
+        cos = float(np.mean(np.sum(res["corpus"] * base["corpus"], axis=1)))
+        line = (
+            f"{backend:<10} {res['load_s']:>7.2f} {res['texts_per_s']:>9.1f} "
+            f"{res['texts_per_s'] / base['texts_per_s']:>7.2f}x {cos:>6.4f}"
+        )
+        for k in args.k:
+            tops = top_k(res["queries"], res["corpus"], k)
+            recall = np.mean([
+                len(a & b) / len(b) for a, b in zip(tops, base_top[k])
+            ])
+            line += f" {recall:>6.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Import-time benchmark for the search path. Each run is a fresh interpreter,
+# so nothing is served from sys.modules:
+#
+#   python bench_imports.py                      # semantic_search, 5 runs
+#   python bench_imports.py --max-ms 800         # exit 1 if startup regresses
+#   python bench_imports.py --module build_shots --allow-heavy
+#
+# Search must not pull in the encoder stack or LLM clients at import time;
+# those load on first encode / first ingest.
+
+# ---------------- CONFIG ----------------
+DEFAULT_MODULE = "semantic_search"
+DEFAULT_RUNS = 5
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "google.genai", "shot_analysis"]
+# ----------------------------------------
+
+PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_once(module):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BASE_PATH, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top=10):
+    # python -X importtime → (cumulative µs, module), slowest first
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_PATH, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark module import time")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if the median import time exceeds this")
+    parser.add_argument("--allow-heavy", action="store_true",
+                        help="don't fail when encoder / LLM modules get imported")
+    args = parser.parse_args()
+
+    results = [run_once(args.module) for _ in range(args.runs)]
+    times = [r["ms"] for r in results]
+    heavy = results[-1]["heavy"]
+
+    print(f"⏱️ import {args.module}: median {statistics.median(times):.0f} ms "
+          f"(min {min(times):.0f}, max {max(times):.0f}, {args.runs} runs)")
+
+    print("🐢 Slowest imports (cumulative):")
+    for us, name in slowest_imports(args.module):
+        print(f"   {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy and not args.allow_heavy:
+        print(f"❌ Heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if args.max_ms is not None and statistics.median(times) > args.max_ms:
+        print(f"❌ Median import time over budget ({args.max_ms:.0f} ms)")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Import path is lightweight")
+
+
+if __name__ == "__main__":
+    main()
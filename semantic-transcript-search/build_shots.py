@@ -1,14 +1,25 @@
 import os
 import json
-from semantic_search import infer_emotion_from_dialogue
+from semantic_search import GEMINI_MODEL, LLM_BATCH_SHOTS, SHOT_VERSION, file_content_key
+from shot_analysis import analyze_shots, infer_emotion_from_dialogue, infer_emotions
+from shot_catalog import ShotCatalog
+from llm_backend import print_cache_stats
+from windowing import scene_windows
 
-TRANSCRIPTS_DIR = "transcripts"
-SHOTS_DIR = "shots"
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+TRANSCRIPTS_DIR = os.path.join(BASE_PATH, "transcripts")
+SHOTS_DIR = os.path.join(BASE_PATH, "shots")
 
-os.makedirs(SHOTS_DIR, exist_ok=True)
 
+def load_timeline(path):
+    # *_timeline.json (list) or streamed *_timeline.jsonl (one entry per line)
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
 
-def transcript_to_signals(timeline):
+
+def timeline_dialogue(timeline):
     dialogue = []
     silences = []
 
@@ -18,70 +29,147 @@ def transcript_to_signals(timeline):
         elif item["type"] == "Silence":
             silences.append(item["duration"])
 
-    full_dialogue = " ".join(dialogue)
-    emotion = infer_emotion_from_dialogue(full_dialogue)
-
-    return {
-        "dialogue": full_dialogue,
-        "pause_duration": max(silences) if silences else 0,
-        "emotion": emotion["emotion"],
-        "emotional_intensity": emotion["emotional_intensity"],
-        "tone": emotion["tone"],
-    }
-
-
-# 🔥 LOAD EXISTING SHOTS (IMPORTANT)
-existing_videos = set()
-
-for file in os.listdir(SHOTS_DIR):
-    if not file.endswith(".json"):
-        continue
-
-    with open(os.path.join(SHOTS_DIR, file), "r") as f:
-        shot = json.load(f)
+    return " ".join(dialogue), max(silences) if silences else 0
 
-    video_file_name = shot.get(
-        "video_file_name",
-        os.path.basename(shot.get("source_video", ""))
-    )
 
-    if video_file_name:
-        existing_videos.add(video_file_name)
+def video_timelines(transcripts_dir):
+    # → {video name: timeline file}; a video with both a .json and a .jsonl
+    # timeline (run once in each mode) uses the newer one
+    newest = {}
+    for file in sorted(os.listdir(transcripts_dir)):
+        if not file.endswith(("_timeline.json", "_timeline.jsonl")):
+            continue
 
+        video_name = file.rsplit("_timeline.json", 1)[0]
+        mtime = os.path.getmtime(os.path.join(transcripts_dir, file))
+        if video_name not in newest or mtime > newest[video_name][0]:
+            newest[video_name] = (mtime, file)
 
+    return {video_name: file for video_name, (_, file) in sorted(newest.items())}
 
-shot_counter = len(existing_videos) + 1
 
-for file in sorted(os.listdir(TRANSCRIPTS_DIR)):
-    if not file.endswith("_timeline.json"):
-        continue
-
-    video_name = file.replace("_timeline.json", "")
-    video_file_name = f"{video_name}.mp4"
-
-    # 🔥 SKIP IF SHOT ALREADY EXISTS
-    if video_file_name in existing_videos:
-        print(f"⏭️ Skipping {video_file_name} (shot already exists)")
-        continue
-
-    with open(os.path.join(TRANSCRIPTS_DIR, file), "r") as f:
-        timeline = json.load(f)
-
-    shot_data = {
-        "shot_id": f"shot{shot_counter}",
-        "source_video": f"data/{video_file_name}",
-        "start_time": 0.0,
-        "end_time": max(seg["end"] for seg in timeline),
-        "source_timeline": file,
-        "signals": transcript_to_signals(timeline),
+def make_signals(full_dialogue, pause_duration, emotion):
+    return {
+        "dialogue": full_dialogue,
+        "pause_duration": pause_duration,
+        "emotion": emotion["emotion"],
+        "emotional_intensity": emotion["emotional_intensity"],
+        "tone": emotion["tone"],
     }
 
-    shot_path = os.path.join(SHOTS_DIR, f"shot{shot_counter}.json")
-
-    with open(shot_path, "w") as f:
-        json.dump(shot_data, f, indent=2)
 
-    print(f"✅ Created {shot_path}")
-
-    shot_counter += 1
-    existing_videos.add(video_file_name)
+def transcript_to_signals(timeline):
+    full_dialogue, pause_duration = timeline_dialogue(timeline)
+    emotion = infer_emotion_from_dialogue(full_dialogue)
+    return make_signals(full_dialogue, pause_duration, emotion)
+
+
+def windows_to_signals(windows):
+    # one emotion request per window, all in flight concurrently
+    emotions = infer_emotions([window["dialogue"] for window in windows])
+
+    return [
+        make_signals(window["dialogue"], window["pause_duration"], emotion)
+        for window, emotion in zip(windows, emotions)
+    ]
+
+
+def build_shots(transcripts_dir=TRANSCRIPTS_DIR, shots_dir=SHOTS_DIR, catalog=None):
+    # One shot per overlapping scene window (see windowing.py), each with its
+    # own start/end so search can jump straight to the moment.
+    os.makedirs(shots_dir, exist_ok=True)
+
+    # 🔥 EXISTING SHOTS COME FROM THE CATALOG (no per-file scan at startup)
+    catalog = catalog or ShotCatalog()
+    catalog.sync_shots_dir(shots_dir)
+
+    shot_counter = catalog.next_shot_number()
+    pending = []
+    windows = []
+    rebuilt_videos = {}
+
+    for video_name, file in video_timelines(transcripts_dir).items():
+        video_file_name = f"{video_name}.mp4"
+        timeline_path = os.path.join(transcripts_dir, file)
+
+        # keyed on timeline content + emotion model + shot logic version
+        cache_key = file_content_key(timeline_path, SHOT_VERSION, GEMINI_MODEL)
+
+        # 🔥 SKIP IF SHOTS ALREADY EXIST AND THEIR INPUTS ARE UNCHANGED
+        # (shots without a key predate the cache → rebuilt once)
+        existing = catalog.get_by_video(video_file_name)
+        if existing and existing["cache_key"] == cache_key:
+            print(f"⏭️ Skipping {video_file_name} (shots already exist)")
+            continue
+
+        video_windows = scene_windows(load_timeline(timeline_path))
+        if not video_windows:
+            print(f"⚠️ No speech in {file}, skipping")
+            continue
+
+        if existing:
+            # inputs changed → rebuild, keeping the video's shot number
+            base_id = existing["shot_id"].split("_w")[0]
+        else:
+            base_id = f"shot{shot_counter}"
+            shot_counter += 1
+
+        rebuilt_videos[video_file_name] = []
+        for window_no, window in enumerate(video_windows):
+            shot_id = f"{base_id}_w{window_no}"
+            rebuilt_videos[video_file_name].append(shot_id)
+
+            pending.append({
+                "shot_id": shot_id,
+                "source_video": f"data/{video_file_name}",
+                "start_time": window["start_time"],
+                "end_time": window["end_time"],
+                "window": window_no,
+                "source_timeline": file,
+                "cache_key": cache_key,
+            })
+            windows.append(window)
+
+    if LLM_BATCH_SHOTS > 1:
+        # N windows per request → emotion, tone and description in one go
+        analyses = analyze_shots(
+            [{"dialogue": w["dialogue"], "pause_duration": w["pause_duration"]} for w in windows]
+        )
+        signals = [
+            make_signals(w["dialogue"], w["pause_duration"], analysis)
+            for w, analysis in zip(windows, analyses)
+        ]
+        descriptions = [analysis["description"] for analysis in analyses]
+    else:
+        # emotion inference for every new window runs concurrently
+        signals = windows_to_signals(windows)
+        descriptions = [None] * len(signals)
+
+    created = []
+    for shot_data, shot_signals, desc in zip(pending, signals, descriptions):
+        shot_data["signals"] = shot_signals
+        if desc:
+            shot_data["description"] = desc
+        shot_path = os.path.join(shots_dir, f"{shot_data['shot_id']}.json")
+
+        with open(shot_path, "w") as f:
+            json.dump(shot_data, f, indent=2)
+
+        catalog.upsert_shot(shot_data, shot_path)
+
+        print(f"✅ Created {shot_path}")
+        created.append(shot_path)
+
+    # windows the rebuild no longer produces (or the old whole-video shot):
+    # files go now, their vectors on the next ingest
+    for video_file_name, shot_ids in rebuilt_videos.items():
+        for row in catalog.retire_video_shots(video_file_name, keep_ids=shot_ids):
+            if row["shot_path"] and os.path.exists(row["shot_path"]):
+                os.remove(row["shot_path"])
+
+    print_cache_stats()
+    return created
+
+
+if __name__ == "__main__":
+    build_shots()
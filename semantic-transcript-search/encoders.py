@@ -0,0 +1,82 @@
+import os
+import threading
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- CONFIG ----------------
+# torch (PyTorch fp32) | onnx (ONNX Runtime fp32) | onnx-int8 (dynamic int8)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# exported ONNX models live here, one directory per model name
+ENCODER_CACHE_DIR = os.getenv("ENCODER_CACHE_DIR", os.path.join(BASE_PATH, "encoders"))
+# int8 kernel target: avx2 | avx512 | avx512_vnni | arm64
+ONNX_QUANT_CONFIG = os.getenv("ONNX_QUANT_CONFIG", "avx2")
+# ----------------------------------------
+
+# Every loader returns an object with the SentenceTransformer surface used by
+# the pipeline: encode(texts, batch_size=..., convert_to_numpy=True) and
+# get_sentence_embedding_dimension(). The ONNX variants go through
+# sentence-transformers' own ONNX backend (needs `onnxruntime` + `optimum`),
+# so tokenisation and pooling are identical to the torch model.
+
+_export_lock = threading.Lock()
+
+
+def _onnx_dir(model_name):
+    return os.path.join(ENCODER_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def load_torch(model_name):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def load_onnx(model_name):
+    from sentence_transformers import SentenceTransformer
+
+    local_dir = _onnx_dir(model_name)
+
+    with _export_lock:
+        if not os.path.exists(os.path.join(local_dir, "onnx", "model.onnx")):
+            # one-off export, reused by every later process
+            print(f"📦 Exporting {model_name} to ONNX → {local_dir}")
+            model = SentenceTransformer(model_name, backend="onnx")
+            model.save_pretrained(local_dir)
+            return model
+
+    return SentenceTransformer(local_dir, backend="onnx")
+
+
+def load_onnx_int8(model_name):
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    local_dir = _onnx_dir(model_name)
+    file_name = f"model_qint8_{ONNX_QUANT_CONFIG}.onnx"
+
+    if not os.path.exists(os.path.join(local_dir, "onnx", file_name)):
+        model = load_onnx(model_name)
+        with _export_lock:
+            print(f"📦 Quantising {model_name} to int8 ({ONNX_QUANT_CONFIG})")
+            export_dynamic_quantized_onnx_model(model, ONNX_QUANT_CONFIG, local_dir)
+
+    return SentenceTransformer(
+        local_dir, backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"}
+    )
+
+
+ENCODERS = {
+    "torch": load_torch,
+    "onnx": load_onnx,
+    "onnx-int8": load_onnx_int8,
+}
+
+
+def register_encoder(name, loader):
+    # loader(model_name) → object with encode() / get_sentence_embedding_dimension()
+    ENCODERS[name] = loader
+
+
+def load_encoder(model_name, backend=EMBEDDING_BACKEND):
+    if backend not in ENCODERS:
+        raise ValueError(f"Unknown embedding backend: {backend} (choose from {', '.join(ENCODERS)})")
+    return ENCODERS[backend](model_name)
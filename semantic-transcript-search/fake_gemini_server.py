@@ -0,0 +1,117 @@
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from llm_backend import StubBackend
+
+# Local stand-in for the Gemini generateContent endpoint, for exercising the
+# LLM scheduler without network access or quota:
+#
+#   python fake_gemini_server.py --port 8765 --rpm 30 --latency 0.2
+#   GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEYS=a,b,c python build_shots.py
+#
+# Each key gets `--rpm` requests per rolling minute, then 429 RESOURCE_EXHAUSTED
+# with a RetryInfo delay until the oldest call leaves the window.
+
+stub = StubBackend()
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    rpm = 30
+    latency = 0.0
+    calls = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _api_key(self):
+        key = self.headers.get("x-goog-api-key")
+        if key:
+            return key
+        return parse_qs(urlparse(self.path).query).get("key", [""])[0]
+
+    def _rate_limited(self, key):
+        # → 0 if the call is allowed, otherwise seconds until it would be
+        now = time.monotonic()
+        with self.lock:
+            window = [t for t in self.calls.get(key, []) if now - t < 60]
+            retry_after = 60 - (now - window[0]) if len(window) >= self.rpm else 0.0
+            if not retry_after:
+                window.append(now)
+            self.calls[key] = window
+        return retry_after
+
+    def do_POST(self):
+        if ":generateContent" not in self.path:
+            self._send(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+            return
+
+        key = self._api_key()
+        if not key:
+            self._send(400, {"error": {"code": 400, "message": "API key not valid", "status": "INVALID_ARGUMENT"}})
+            return
+
+        retry_after = self._rate_limited(key)
+        if retry_after:
+            self._send(429, {"error": {
+                "code": 429,
+                "message": "quota exceeded",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [{
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{max(1, round(retry_after))}s",
+                }],
+            }})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        config = request.get("generationConfig", {})
+        json_mode = config.get("responseMimeType") == "application/json"
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        text = stub.generate(prompt, "fake", config.get("temperature", 0.0), json_mode)
+        self._send(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }]
+        })
+
+
+def serve(port=8765, rpm=30, latency=0.0):
+    FakeGeminiHandler.rpm = rpm
+    FakeGeminiHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGeminiHandler)
+    print(f"🧪 Fake Gemini on http://127.0.0.1:{port} ({rpm} rpm/key, {latency}s latency)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    serve(args.port, args.rpm, args.latency)
@@ -0,0 +1,130 @@
+import os
+import re
+import numpy as np
+
+# ---------------- CONFIG ----------------
+BM25_K1 = 1.2
+BM25_B = 0.75
+# ----------------------------------------
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class LexicalIndex:
+    # BM25 inverted index over shot dialogue, stored as flat numpy arrays:
+    # the postings of term t are post_docs / post_tf[term_ptr[t]:term_ptr[t+1]]
+    # (doc positions into doc_ids / doc_len).
+    def __init__(self, terms, term_ptr, post_docs, post_tf, doc_ids, doc_len):
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.doc_ids = doc_ids
+        self.doc_len = doc_len
+
+        self.vocab = {term: i for i, term in enumerate(terms.tolist())}
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # ---------------- BUILD / PERSIST ----------------
+    @classmethod
+    def build(cls, docs):
+        # docs: iterable of (faiss_id, text)
+        postings = {}
+        doc_ids = []
+        doc_len = []
+
+        for doc, (faiss_id, text) in enumerate(docs):
+            tokens = tokenize(text)
+            doc_ids.append(faiss_id)
+            doc_len.append(len(tokens))
+
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc, tf))
+
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype="int64")
+        term_ptr[1:] = np.cumsum([len(postings[t]) for t in terms])
+
+        flat = [p for t in terms for p in postings[t]]
+        post_docs = np.array([doc for doc, _ in flat], dtype="int32")
+        post_tf = np.array([tf for _, tf in flat], dtype="int32")
+
+        return cls(
+            np.array(terms, dtype=str),
+            term_ptr,
+            post_docs,
+            post_tf,
+            np.array(doc_ids, dtype="int64"),
+            np.array(doc_len, dtype="int32"),
+        )
+
+    def save(self, path):
+        # one file, swapped in atomically (see save_faiss)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp,
+            terms=self.terms,
+            term_ptr=self.term_ptr,
+            post_docs=self.post_docs,
+            post_tf=self.post_tf,
+            doc_ids=self.doc_ids,
+            doc_len=self.doc_len,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["terms"],
+                data["term_ptr"],
+                data["post_docs"],
+                data["post_tf"],
+                data["doc_ids"],
+                data["doc_len"],
+            )
+
+    # ---------------- QUERY ----------------
+    def scores(self, query: str) -> np.ndarray:
+        # BM25 score of every doc (0 where no query term occurs)
+        scores = np.zeros(len(self.doc_ids), dtype="float32")
+        n_docs = len(self.doc_ids)
+
+        for token in set(tokenize(query)):
+            t = self.vocab.get(token)
+            if t is None:
+                continue
+
+            start, end = self.term_ptr[t], self.term_ptr[t + 1]
+            docs = self.post_docs[start:end]
+            tf = self.post_tf[start:end].astype("float32")
+
+            df = end - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / self.avg_len)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return scores
+
+    def search(self, query: str, k: int):
+        # → [(faiss_id, score)], best first, only docs sharing a query term
+        if not len(self.doc_ids):
+            return []
+
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        return [(int(self.doc_ids[d]), float(scores[d])) for d in matched]
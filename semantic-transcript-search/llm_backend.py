@@ -0,0 +1,406 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- CONFIG ----------------
+# "gemini" (default) or "stub" (deterministic, offline)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+# point the Gemini client at another endpoint, e.g. fake_gemini_server.py
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(BASE_PATH, "llm_cache"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+# per-key Gemini quota, enforced by llm_scheduler's token buckets
+LLM_RPM_PER_KEY = float(os.getenv("LLM_RPM_PER_KEY", "10"))
+LLM_BURST_PER_KEY = int(os.getenv("LLM_BURST_PER_KEY", "2"))
+# ----------------------------------------
+
+EMOTIONS = [
+    "anger", "sadness", "fear", "frustration", "hope",
+    "resignation", "affection", "confidence", "uncertainty",
+]
+INTENSITIES = ["low", "medium", "high"]
+
+
+class RateLimitError(Exception):
+    # quota / 429 from a provider; carries the key that hit it and, when the
+    # provider sent one (Gemini's RetryInfo "retryDelay": "27s"), how long to wait
+    def __init__(self, message, api_key=None, retry_after=None):
+        super().__init__(message)
+        self.api_key = api_key
+        self.retry_after = retry_after if retry_after is not None else _retry_delay(message)
+
+
+def _retry_delay(message):
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"](\d+(?:\.\d+)?)s", str(message))
+    return float(match.group(1)) if match else None
+
+
+class InvalidKeyError(Exception):
+    def __init__(self, message, api_key=None):
+        super().__init__(message)
+        self.api_key = api_key
+
+
+########################################
+# BACKENDS
+########################################
+class LLMBackend:
+    name = "base"
+
+    # `api_key`: pin the call to one key (used by llm_scheduler); backends
+    # then raise RateLimitError / InvalidKeyError instead of rotating.
+    def generate(self, prompt, model, temperature, json_mode=False, task=None,
+                 api_key=None):
+        raise NotImplementedError
+
+    def keys(self):
+        return [None]
+
+    def rate_limit(self):
+        # → (requests per minute, burst) per key, or None when the backend
+        # has no quota (stub / fake backends run as fast as they can)
+        return None
+
+    # cache hooks (see CachedBackend): the scheduler checks the cache before
+    # spending a rate-limit token, then stores the fresh answer itself
+    def lookup(self, prompt, model, temperature):
+        return None
+
+    def store(self, prompt, model, temperature, response):
+        pass
+
+    def generate_uncached(self, prompt, model, temperature, json_mode=False,
+                          task=None, api_key=None):
+        return self.generate(prompt, model, temperature, json_mode, task, api_key=api_key)
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_keys=None):
+        if api_keys is None:
+            api_keys = [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",")]
+        self.api_keys = [k for k in api_keys if k]
+
+        # Safety check (only when Gemini is actually used)
+        if not self.api_keys:
+            raise RuntimeError("❌ No Gemini API keys found in .env")
+
+        self._current_key_index = 0
+        self._clients = {}
+
+        from google import genai
+        from google.genai import types
+        from google.genai.errors import ClientError
+
+        self._genai = genai
+        self._types = types
+        self._client_error = ClientError
+
+    # ---------------- CLIENT ROTATION ----------------
+    def get_client(self, api_key=None):
+        if api_key is None:
+            if self._current_key_index >= len(self.api_keys):
+                raise RuntimeError("❌ All Gemini API keys exhausted")
+            api_key = self.api_keys[self._current_key_index]
+
+        if api_key not in self._clients:
+            http_options = None
+            if GEMINI_BASE_URL:
+                http_options = self._types.HttpOptions(base_url=GEMINI_BASE_URL)
+            self._clients[api_key] = self._genai.Client(
+                api_key=api_key, http_options=http_options
+            )
+        return self._clients[api_key]
+
+    def keys(self):
+        return list(self.api_keys)
+
+    def rate_limit(self):
+        return LLM_RPM_PER_KEY, LLM_BURST_PER_KEY
+
+    def rotate_key(self):
+        self._current_key_index += 1
+        print(f"🔁 Switching to Gemini API key #{self._current_key_index + 1}")
+
+    def _call(self, client, prompt, model, temperature, json_mode):
+        config = self._types.GenerateContentConfig(temperature=temperature)
+        if json_mode:
+            config.response_mime_type = "application/json"
+
+        response = client.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=config,
+        )
+
+        if not response.text:
+            raise ValueError("Empty response")
+
+        return response.text
+
+    def generate(self, prompt, model, temperature, json_mode=False, task=None,
+                 api_key=None):
+        if api_key is not None:
+            return self._generate_with_key(prompt, model, temperature, json_mode, api_key)
+
+        while True:
+            try:
+                return self._call(self.get_client(), prompt, model, temperature, json_mode)
+
+            except self._client_error as e:
+                msg = str(e)
+
+                # 🔥 ROTATE KEY ON QUOTA OR INVALID KEY
+                if "RESOURCE_EXHAUSTED" in msg or "429" in msg or "API key" in msg:
+                    self.rotate_key()
+                    continue
+
+                # Other Gemini errors → real failure
+                raise e
+
+    def _generate_with_key(self, prompt, model, temperature, json_mode, api_key):
+        try:
+            return self._call(self.get_client(api_key), prompt, model, temperature, json_mode)
+
+        except self._client_error as e:
+            msg = str(e)
+
+            if "RESOURCE_EXHAUSTED" in msg or "429" in msg:
+                raise RateLimitError(msg, api_key) from e
+            if "API key" in msg:
+                raise InvalidKeyError(msg, api_key) from e
+
+            raise e
+
+
+class StubBackend(LLMBackend):
+    # Deterministic offline responses derived from the prompt hash, so the
+    # whole semantic pipeline can run (and be benchmarked) without network.
+    name = "stub"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    @staticmethod
+    def _digest(prompt):
+        return hashlib.sha256(prompt.encode()).digest()
+
+    def _emotion(self, prompt):
+        d = self._digest(prompt)
+        return {
+            "emotion": EMOTIONS[d[0] % len(EMOTIONS)],
+            "emotional_intensity": INTENSITIES[d[1] % len(INTENSITIES)],
+            "tone": "neutral",
+        }
+
+    def _description(self, prompt):
+        emotion = self._emotion(prompt)
+        return (
+            f"A {emotion['emotional_intensity']}-intensity moment of "
+            f"{emotion['emotion']} between the characters."
+        )
+
+    def _shot_batch(self, prompt):
+        # multi-shot prompts carry their scenes as a ```json block
+        scenes = json.loads(re.search(r"```json\s*(.*?)```", prompt, re.S).group(1))
+        results = []
+        for scene in scenes:
+            analysis = self._emotion(scene["dialogue"])
+            analysis["id"] = scene["id"]
+            analysis["description"] = self._description(scene["dialogue"])
+            results.append(analysis)
+        return results
+
+    def generate(self, prompt, model, temperature, json_mode=False, task=None,
+                 api_key=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        if task == "shot_batch" or (task is None and "```json" in prompt):
+            return json.dumps(self._shot_batch(prompt))
+        if json_mode or task == "emotion":
+            return json.dumps(self._emotion(prompt))
+        return self._description(prompt)
+
+
+########################################
+# CONTENT-ADDRESSED DISK CACHE
+########################################
+class LLMCache:
+    # <root>/<2 hex>/<sha256>.json, keyed on (model, prompt, temperature).
+    # File mtime is the LRU clock: hits touch it, eviction drops the oldest.
+    def __init__(self, root=LLM_CACHE_DIR, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._count = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, prompt, temperature):
+        payload = json.dumps([model, prompt, temperature])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if os.path.isdir(sub_dir):
+                for file in os.listdir(sub_dir):
+                    if file.endswith(".json"):
+                        yield os.path.join(sub_dir, file)
+
+    def get(self, model, prompt, temperature):
+        path = self._path(self.key(model, prompt, temperature))
+
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted in the meantime
+
+        with self._lock:
+            self.hits += 1
+        return entry["response"]
+
+    def put(self, model, prompt, temperature, response):
+        path = self._path(self.key(model, prompt, temperature))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"model": model, "temperature": temperature, "response": response}, f)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._count is None:
+                self._count = sum(1 for _ in self._entries())
+            else:
+                self._count += 1
+
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # drop the least recently used 10% in one pass → eviction stays rare
+        entries = sorted(self._entries(), key=lambda p: os.stat(p).st_mtime)
+        target = int(self.max_entries * 0.9)
+
+        for path in entries[: max(0, len(entries) - target)]:
+            os.remove(path)
+            self.evictions += 1
+
+        self._count = min(len(entries), target)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedBackend(LLMBackend):
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.name = f"cached-{backend.name}"
+
+    def _cache_model(self, model):
+        # keep stub answers out of the real provider's cache namespace
+        return model if self.backend.name == "gemini" else f"{self.backend.name}/{model}"
+
+    def keys(self):
+        return self.backend.keys()
+
+    def rate_limit(self):
+        return self.backend.rate_limit()
+
+    def lookup(self, prompt, model, temperature):
+        return self.cache.get(self._cache_model(model), prompt, temperature)
+
+    def store(self, prompt, model, temperature, response):
+        self.cache.put(self._cache_model(model), prompt, temperature, response)
+
+    def generate_uncached(self, prompt, model, temperature, json_mode=False,
+                          task=None, api_key=None):
+        return self.backend.generate(
+            prompt, model, temperature, json_mode, task, api_key=api_key
+        )
+
+    def generate(self, prompt, model, temperature, json_mode=False, task=None,
+                 api_key=None):
+        cached = self.lookup(prompt, model, temperature)
+        if cached is not None:
+            return cached
+
+        response = self.generate_uncached(
+            prompt, model, temperature, json_mode, task, api_key=api_key
+        )
+        self.store(prompt, model, temperature, response)
+        return response
+
+
+########################################
+# FACTORY
+########################################
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=LLM_BACKEND):
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+def get_llm_backend():
+    # created on first use → search-only code never needs API keys
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = CachedBackend(create_backend(), LLMCache())
+        return _backend
+
+
+def set_llm_backend(backend, cache=True):
+    global _backend
+    with _backend_lock:
+        _backend = CachedBackend(backend, LLMCache()) if cache else backend
+    return _backend
+
+
+def cache_stats():
+    # None until an LLM call has actually been made
+    cache = getattr(_backend, "cache", None)
+    return cache.stats() if cache else None
+
+
+def print_cache_stats():
+    stats = cache_stats()
+    if stats and stats["hits"] + stats["misses"]:
+        print(
+            f"🗃️ LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evicted"
+        )
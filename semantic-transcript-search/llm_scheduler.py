@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_backend import RateLimitError, InvalidKeyError, get_llm_backend
+
+# ---------------- CONFIG ----------------
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# how long one request keeps retrying through 429s before giving up; spans
+# several quota windows so a key set that is briefly over quota still drains
+LLM_RETRY_SECONDS = float(os.getenv("LLM_RETRY_SECONDS", "600"))
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+# ----------------------------------------
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec, capacity):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        # → 0 if a token was taken, otherwise seconds until one is available
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class KeySlot:
+    def __init__(self, api_key, bucket):
+        self.api_key = api_key
+        self.bucket = bucket
+        self.cooldown_until = 0.0
+        self.limited_at = 0.0
+        self.failures = 0
+        self.dead = False
+        self.in_flight = 0
+
+
+class LLMScheduler:
+    # Fans requests out over every API key at once. Each key has its own token
+    # bucket (sized by backend.rate_limit(), or by rpm_per_key / burst when
+    # given; none for backends without a quota); a RESOURCE_EXHAUSTED puts
+    # only that key on exponential backoff (or the server's retry delay, if
+    # longer) and the request is retried on whichever key frees up first,
+    # until retry_seconds have passed.
+    def __init__(self, backend=None, keys=None, max_in_flight=LLM_MAX_IN_FLIGHT,
+                 rpm_per_key=None, burst=None, retry_seconds=LLM_RETRY_SECONDS):
+        self.backend = backend or get_llm_backend()
+        keys = keys if keys is not None else self.backend.keys()
+
+        limit = self.backend.rate_limit()
+        if rpm_per_key is not None or burst is not None:
+            default_rpm, default_burst = limit or (60.0, 1)
+            limit = (
+                default_rpm if rpm_per_key is None else rpm_per_key,
+                default_burst if burst is None else burst,
+            )
+
+        self.slots = [
+            KeySlot(key, TokenBucket(limit[0] / 60.0, limit[1]) if limit else None)
+            for key in keys
+        ]
+        self.max_in_flight = max_in_flight
+        self.retry_seconds = retry_seconds
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+
+    # ---------------- KEY SELECTION ----------------
+    def _acquire_slot(self, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                live = [s for s in self.slots if not s.dead]
+                if not live:
+                    raise RuntimeError("❌ All Gemini API keys exhausted")
+
+                wait = None
+                # least-loaded key first → spread requests across keys
+                for slot in sorted(live, key=lambda s: s.in_flight):
+                    if slot.cooldown_until > now:
+                        slot_wait = slot.cooldown_until - now
+                    else:
+                        slot_wait = slot.bucket.try_take(now) if slot.bucket else 0.0
+                        if slot_wait == 0:
+                            slot.in_flight += 1
+                            return slot, now
+
+                    wait = slot_wait if wait is None else min(wait, slot_wait)
+
+                if now + wait > deadline:
+                    raise RuntimeError(
+                        f"❌ LLM request still rate limited after {self.retry_seconds:.0f}s"
+                    )
+
+            time.sleep(min(wait, 1.0))
+
+    def _release_slot(self, slot, started, error=None):
+        with self._lock:
+            slot.in_flight -= 1
+
+            if error is None:
+                slot.failures = 0
+            elif isinstance(error, RateLimitError):
+                self.rate_limited += 1
+                now = time.monotonic()
+                retry_after = error.retry_after or 0.0
+                # requests sent before the last 429 don't escalate the backoff,
+                # but a longer server-side retry delay still applies
+                if started < slot.limited_at:
+                    slot.cooldown_until = max(slot.cooldown_until, now + retry_after)
+                    return
+
+                slot.failures += 1
+                slot.limited_at = now
+                backoff = max(min(BACKOFF_MAX, BACKOFF_BASE ** slot.failures), retry_after)
+                slot.cooldown_until = now + backoff
+                print(f"⏳ Key #{self.slots.index(slot) + 1} rate limited, backing off {backoff:.0f}s")
+            elif isinstance(error, InvalidKeyError):
+                slot.dead = True
+                print(f"🔁 Dropping invalid Gemini API key #{self.slots.index(slot) + 1}")
+
+    # ---------------- REQUESTS ----------------
+    def call(self, prompt, model, temperature, json_mode=False, task=None):
+        cached = self.backend.lookup(prompt, model, temperature)
+        if cached is not None:
+            return cached
+
+        deadline = time.monotonic() + self.retry_seconds
+        while True:
+            slot, started = self._acquire_slot(deadline)
+            try:
+                response = self.backend.generate_uncached(
+                    prompt, model, temperature, json_mode, task, api_key=slot.api_key
+                )
+            except (RateLimitError, InvalidKeyError) as e:
+                self._release_slot(slot, started, e)
+                continue
+            except Exception:
+                self._release_slot(slot, started)
+                raise
+
+            self._release_slot(slot, started)
+            with self._lock:
+                self.requests += 1
+
+            self.backend.store(prompt, model, temperature, response)
+            return response
+
+    def map(self, requests, return_exceptions=False):
+        # requests: iterable of dicts with call() kwargs → results in order
+        requests = list(requests)
+        if not requests:
+            return []
+
+        workers = min(self.max_in_flight, len(requests))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.call, **req) for req in requests]
+
+            if not return_exceptions:
+                return [f.result() for f in futures]
+
+            return [f.exception() or f.result() for f in futures]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,136 @@
+import os
+import json
+import struct
+import numpy as np
+
+# Compact columnar metadata for the FAISS index, read through a memory map:
+#
+#   b"SHOTMETA" | uint32 header length | JSON header | 8-byte aligned sections
+#
+# Sections: "ids" (int64, sorted faiss ids) and, per column, "<col>.offsets"
+# (uint64, rows + 1) + "<col>.data" (JSON-encoded cells, UTF-8). Opening the
+# file only parses the header; rows are decoded on access, so startup cost
+# doesn't grow with the library and every process shares the page cache.
+
+MAGIC = b"SHOTMETA"
+FORMAT_VERSION = 1
+
+
+def _align(n, to=8):
+    return (n + to - 1) // to * to
+
+
+class MetadataStore:
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a metadata store: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported metadata store version: {header['version']}")
+
+        self.columns = header["columns"]
+        self._rows = header["rows"]
+        # free-form facts about the index (e.g. which encoder built it)
+        self.info = header.get("info", {})
+        self._buf = np.memmap(path, dtype=np.uint8, mode="r")
+
+        self._sections = {}
+        for name, (offset, length, dtype) in header["sections"].items():
+            self._sections[name] = self._buf[offset:offset + length].view(dtype)
+
+        self._ids = self._sections["ids"]
+
+    # ---------------- LOOKUPS ----------------
+    def __len__(self):
+        return self._rows
+
+    def _position(self, faiss_id):
+        pos = int(np.searchsorted(self._ids, faiss_id))
+        if pos < self._rows and self._ids[pos] == faiss_id:
+            return pos
+        return None
+
+    def __contains__(self, faiss_id):
+        return self._position(faiss_id) is not None
+
+    def _cell(self, column, pos):
+        offsets = self._sections[f"{column}.offsets"]
+        start, end = int(offsets[pos]), int(offsets[pos + 1])
+        return json.loads(self._sections[f"{column}.data"][start:end].tobytes())
+
+    def _row(self, pos):
+        return {column: self._cell(column, pos) for column in self.columns}
+
+    def __getitem__(self, faiss_id):
+        pos = self._position(faiss_id)
+        if pos is None:
+            raise KeyError(faiss_id)
+        return self._row(pos)
+
+    def get(self, faiss_id, default=None):
+        pos = self._position(faiss_id)
+        return default if pos is None else self._row(pos)
+
+    def keys(self):
+        return (int(i) for i in self._ids)
+
+    def values(self):
+        return (self._row(pos) for pos in range(self._rows))
+
+    def to_dict(self):
+        return {int(i): self._row(pos) for pos, i in enumerate(self._ids)}
+
+    # ---------------- WRITE ----------------
+    @staticmethod
+    def write(path, rows, info=None):
+        rows = sorted(rows, key=lambda row: row["faiss_id"])
+
+        columns = []
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    columns.append(column)
+
+        sections = [("ids", np.array([row["faiss_id"] for row in rows], dtype="<i8"))]
+        for column in columns:
+            cells = [json.dumps(row.get(column)).encode() for row in rows]
+            offsets = np.zeros(len(cells) + 1, dtype="<u8")
+            offsets[1:] = np.cumsum([len(cell) for cell in cells])
+            sections.append((f"{column}.offsets", offsets))
+            sections.append((f"{column}.data", np.frombuffer(b"".join(cells), dtype=np.uint8)))
+
+        layout = {name: [0, array.nbytes, array.dtype.str] for name, array in sections}
+        header = {"version": FORMAT_VERSION, "rows": len(rows), "columns": columns,
+                  "sections": layout, "info": info or {}}
+
+        # the header records the section offsets, so its own length depends on
+        # them → grow the data start until the header fits in front of it
+        data_start = 0
+        while True:
+            offset = data_start
+            for name, array in sections:
+                layout[name][0] = offset
+                offset = _align(offset + array.nbytes)
+
+            header_bytes = json.dumps(header).encode()
+            needed = _align(len(MAGIC) + 4 + len(header_bytes))
+            if needed <= data_start:
+                break
+            data_start = needed
+
+        # written next to the target and swapped in → readers that still
+        # have the old file mapped are never handed a half-written one
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in sections:
+                f.seek(layout[name][0])
+                f.write(array.tobytes())
+        os.replace(tmp, path)
@@ -0,0 +1,262 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from semantic_search import (
+    SEARCH_OVERSAMPLE,
+    TOP_K_RESULTS,
+    LiveSearchIndex,
+    get_embedding_model,
+    search_videos,
+    semantic_search_batch,
+)
+
+# Standalone search service: one model + index per process, concurrent
+# queries micro-batched into a single encode + index.search.
+#
+#   python search_server.py --port 8770 --batch-ms 5
+#   curl 'http://127.0.0.1:8770/search?q=best+part+of+my+day&k=3'
+#   curl -d '{"queries": ["angry couple", "quiet regret"], "k": 2}' http://127.0.0.1:8770/search
+#   curl http://127.0.0.1:8770/stats          # latency percentiles, batch sizes
+
+# ---------------- CONFIG ----------------
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH_SIZE = 64
+MAX_K = 50
+LATENCY_WINDOW = 10_000  # most recent requests kept for percentiles
+# ----------------------------------------
+
+
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def record(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batch_sizes.append(size)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies, dtype="float64") * 1000
+            batches = np.array(self.batch_sizes, dtype="float64")
+            requests, errors = self.requests, self.errors
+            uptime = time.monotonic() - self.started
+
+        stats = {
+            "requests": requests,
+            "errors": errors,
+            "qps": requests / uptime if uptime else 0.0,
+            "batches": len(batches),
+        }
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            stats["latency_ms"] = {
+                "p50": round(p50, 2),
+                "p90": round(p90, 2),
+                "p99": round(p99, 2),
+                "max": round(latencies.max(), 2),
+            }
+        if len(batches):
+            stats["mean_batch_size"] = round(batches.mean(), 2)
+        return stats
+
+
+class MicroBatcher:
+    # Requests arriving within `window_ms` of the first one in a batch (up to
+    # `max_batch`) share one encode call and one FAISS search; lexical fusion
+    # and per-video grouping then run per query.
+    def __init__(self, live_index, stats, window_ms=BATCH_WINDOW_MS,
+                 max_batch=MAX_BATCH_SIZE):
+        self.live_index = live_index
+        self.stats = stats
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, query, k):
+        future = Future()
+        self._queue.put((query, k, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.stats.record_batch(len(batch))
+
+            try:
+                index, metadata = self.live_index.get()
+                lexical = self.live_index.lexical
+                queries = [query for query, _, _ in batch]
+                k_max = max(k for _, k, _ in batch)
+
+                batch_hits = semantic_search_batch(
+                    queries, index, metadata, k_max * SEARCH_OVERSAMPLE
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (query, k, future), hits in zip(batch, batch_hits):
+                try:
+                    future.set_result(
+                        search_videos(query, index, metadata, k, lexical=lexical, vector_hits=hits)
+                    )
+                except Exception as e:
+                    future.set_exception(e)
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    batcher = None
+    stats = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _search(self, queries, k):
+        started = time.perf_counter()
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            k = 0
+        if k < 1:
+            self._send(400, {"error": "k must be a positive integer"})
+            return
+        k = min(k, MAX_K)
+
+        futures = [self.batcher.submit(query, k) for query in queries]
+        try:
+            results = [future.result() for future in futures]
+        except Exception as e:
+            self.stats.record_error()
+            self._send(500, {"error": str(e)})
+            return
+
+        self.stats.record(time.perf_counter() - started)
+        self._send(200, {"results": results})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif url.path == "/stats":
+            self._send(200, self.stats.snapshot())
+        elif url.path == "/search":
+            query = params.get("q", [""])[0]
+            if not query.strip():
+                self._send(400, {"error": "missing q"})
+                return
+            self._search([query], params.get("k", [TOP_K_RESULTS])[0])
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/search":
+            self._send(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "invalid JSON"})
+            return
+
+        if not isinstance(request, dict):
+            self._send(400, {"error": "request body must be a JSON object"})
+            return
+
+        queries = request.get("queries")
+        if queries is None:
+            queries = [request.get("query", "")]
+        elif not isinstance(queries, list) or not queries:
+            self._send(400, {"error": "queries must be a non-empty list"})
+            return
+
+        if not all(isinstance(q, str) and q.strip() for q in queries):
+            self._send(400, {"error": "missing query"})
+            return
+
+        # a JSON integer; not "5", 2.5 or true (bool is an int subclass)
+        k = request.get("k", TOP_K_RESULTS)
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            self._send(400, {"error": "k must be a positive integer"})
+            return
+
+        self._search(queries, k)
+
+
+def serve(host="127.0.0.1", port=8770, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE):
+    # load everything up front so the first request isn't the slow one
+    get_embedding_model()
+    live_index = LiveSearchIndex()
+    index, _ = live_index.get()
+
+    stats = LatencyStats()
+    SearchHandler.stats = stats
+    SearchHandler.batcher = MicroBatcher(live_index, stats, window_ms, max_batch)
+
+    server = ThreadingHTTPServer((host, port), SearchHandler)
+    server.daemon_threads = True
+    print(f"🔎 Search server on http://{host}:{port} ({index.ntotal} vectors, "
+          f"{window_ms:g} ms batching window, max batch {max_batch})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching semantic search server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--batch-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.batch_ms, args.max_batch)
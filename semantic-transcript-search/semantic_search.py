@@ -1,220 +1,615 @@
 import os
+import re
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 import faiss
 import numpy as np
-from google import genai
-from google.genai import types
-from google.genai.errors import ClientError
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv  
+from shot_catalog import ShotCatalog
+import vector_index
+from vector_index import FAISS_INDEX_KIND, shot_uid
+from metadata_store import MetadataStore
+from encoders import EMBEDDING_BACKEND, load_encoder
+from lexical_index import LexicalIndex
 load_dotenv()
 ########################################
 # CONFIG
 ########################################
-BASE_PATH = os.getcwd()
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+SHOTS_DIR = os.path.join(BASE_PATH, "shots")
 FAISS_INDEX_FILE = os.path.join(BASE_PATH, "faiss.index")
-METADATA_FILE = os.path.join(BASE_PATH, "metadata.json")
+METADATA_FILE = os.path.join(BASE_PATH, "metadata.bin")
+# written by older versions; read once and converted to METADATA_FILE
+LEGACY_METADATA_FILE = os.path.join(BASE_PATH, "metadata.json")
+# BM25 over shot dialogue, fused with the vector hits (see hybrid_search)
+LEXICAL_INDEX_FILE = os.path.join(BASE_PATH, "lexical.npz")
 
-# 🔥 ADD YOUR REAL KEYS HERE
-GEMINI_API_KEYS = os.getenv("GEMINI_API_KEYS", "").split(",")
-
-# Safety check
-if not GEMINI_API_KEYS or GEMINI_API_KEYS == [""]:
-    raise RuntimeError("❌ No Gemini API keys found in .env")
+# 🔥 ADD YOUR REAL KEYS HERE (GEMINI_API_KEYS=key1,key2 in .env)
+# Keys are only checked when the Gemini backend is first used; set
+# LLM_BACKEND=stub to run offline (see llm_backend.py).
 
 TOP_K_RESULTS = 1
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# window hits fetched per requested video, and moments kept per video
+SEARCH_OVERSAMPLE = int(os.getenv("SEARCH_OVERSAMPLE", "10"))
+WINDOWS_PER_VIDEO = 3
+# reciprocal rank fusion constant (standard value from the RRF paper)
+RRF_K = 60
+# from this many vectors on, vector scoring is limited to the top lexical
+# candidates when the query has enough of them (trades paraphrase recall
+# for latency on large libraries)
+LEXICAL_PREFILTER_MIN_VECTORS = int(os.getenv("LEXICAL_PREFILTER_MIN_VECTORS", "200000"))
+LEXICAL_PREFILTER_CANDIDATES = int(os.getenv("LEXICAL_PREFILTER_CANDIDATES", "5000"))
+# recent / popular query embeddings kept in memory (skip the encoder)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+# shots packed into one emotion+description request (1 = one call per task)
+LLM_BATCH_SHOTS = int(os.getenv("LLM_BATCH_SHOTS", "10"))
+
+GEMINI_MODEL = "gemini-2.5-flash"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Bump when shot building / indexing logic changes → forces recompute
+SHOT_VERSION = "2"
+INDEX_VERSION = "1"
+
+# recorded with the index: vectors from another model / backend (torch vs
+# ONNX int8 drift) must not be mixed with this process's embeddings
+ENCODER_INFO = {"embedding_model": EMBEDDING_MODEL_NAME, "embedding_backend": EMBEDDING_BACKEND}
 
 ########################################
 # GLOBALS
 ########################################
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-_current_key_index = 0
-
-
-########################################
-# GEMINI CLIENT ROTATION
-########################################
-def get_gemini_client():
-    global _current_key_index
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
 
-    if _current_key_index >= len(GEMINI_API_KEYS):
-        raise RuntimeError("❌ All Gemini API keys exhausted")
 
-    return genai.Client(api_key=GEMINI_API_KEYS[_current_key_index])
+def get_embedding_model():
+    # one encoder per process, shared by every Streamlit session / thread;
+    # torch / ONNX / int8 picked by EMBEDDING_BACKEND (see encoders.py)
+    # (torch / onnxruntime themselves are imported on first encode)
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            _embedding_model = load_encoder(EMBEDDING_MODEL_NAME)
+        return _embedding_model
 
 
-def rotate_key():
-    global _current_key_index
-    _current_key_index += 1
-    print(f"🔁 Switching to Gemini API key #{_current_key_index + 1}")
+# moved to shot_analysis; still importable from here, but only loaded
+# (with the LLM clients) when actually asked for
+_SHOT_ANALYSIS_NAMES = {
+    "infer_emotion_from_dialogue", "infer_emotions",
+    "generate_semantic_description", "generate_semantic_descriptions",
+    "analyze_shots",
+}
 
 
-########################################
-# 1. EMOTION INFERENCE
-def infer_emotion_from_dialogue(dialogue: str) -> dict:
-    prompt = f"""
-Analyze the following movie dialogue.
-
-Dialogue:
-\"\"\"
-{dialogue}
-\"\"\"
-
-Return STRICT JSON:
-{{
-  "emotion": one of [anger, sadness, fear, frustration, hope, resignation, affection, confidence, uncertainty],
-  "emotional_intensity": one of [low, medium, high],
-  "tone": string
-}}
-"""
-
-    while True:
-        try:
-            client = get_gemini_client()
-
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.1, response_mime_type="application/json"
-                ),
-            )
-
-            if not response.text:
-                raise ValueError("Empty response")
-
-            return json.loads(response.text)
-
-        except ClientError as e:
-            msg = str(e)
-
-            # 🔥 ROTATE KEY ON QUOTA OR INVALID KEY
-            if "RESOURCE_EXHAUSTED" in msg or "429" in msg or "API key" in msg:
-                rotate_key()
-                continue
+def __getattr__(name):
+    if name in _SHOT_ANALYSIS_NAMES:
+        import shot_analysis
 
-            # Other Gemini errors → real failure
-            raise e
+        return getattr(shot_analysis, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 ########################################
-# 2. SEMANTIC DESCRIPTION
+# CACHE KEYS
 ########################################
-def generate_semantic_description(signals: dict) -> str:
-    prompt = f"""
-You are analyzing a film scene for semantic search.
-
-Signals:
-- Dialogue: "{signals['dialogue']}"
-- Dominant emotion: {signals['emotion']}
-- Emotional intensity: {signals['emotional_intensity']}
-- Tone: {signals['tone']}
-- Longest silence: {signals['pause_duration']} seconds
-
-Task:
-Write ONE concise sentence describing the emotional intent
-and narrative meaning of this moment.
-Avoid metaphors. Use neutral language.
-"""
-
-    while True:
-        try:
-            client = get_gemini_client()
-
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.2),
-            )
-
-            if not response.text:
-                raise ValueError("Empty response")
-
-            return response.text.strip()
-
-        except ClientError as e:
-            msg = str(e)
-
-            if "RESOURCE_EXHAUSTED" in msg or "429" in msg or "API key" in msg:
-                rotate_key()
-                continue
+def content_key(*parts) -> str:
+    # stable hash of stage inputs + parameters (model names, versions)
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True).encode()
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
 
-            raise e
+
+def file_content_key(path, *params) -> str:
+    with open(path, "rb") as f:
+        return content_key(f.read(), *params)
 
 
 ########################################
 # 3. LOAD OR CREATE FAISS
 ########################################
+def _has_metadata():
+    return os.path.exists(METADATA_FILE) or os.path.exists(LEGACY_METADATA_FILE)
+
+
+def _read_metadata():
+    if os.path.exists(METADATA_FILE):
+        return list(MetadataStore(METADATA_FILE).values())
+
+    with open(LEGACY_METADATA_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_faiss(index, metadata):
+    # both files are swapped in atomically → processes that have the old
+    # ones memory-mapped keep a consistent view until they reload. The pair
+    # is not swapped as one: a reader reloading between the two writes gets
+    # the new metadata with the old index, which may still hold ids retired
+    # from the metadata (_vector_hits skips those) and lacks the new ones.
+    # The index write changes the file stamp again, so it reloads once more.
+    MetadataStore.write(METADATA_FILE, metadata.values(), {"encoder": ENCODER_INFO})
+
+    tmp = f"{FAISS_INDEX_FILE}.{os.getpid()}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, FAISS_INDEX_FILE)
+
+    if os.path.exists(LEGACY_METADATA_FILE):
+        os.remove(LEGACY_METADATA_FILE)
+
+
+def _migrate_legacy_index(index, rows):
+    # Pre-IDMap index: IndexFlatL2 over raw embeddings, rows matched to
+    # metadata.json by position → cosine IndexIDMap2 keyed by stable shot ids.
+    print("🔀 Migrating legacy FAISS index to stable shot ids (cosine)")
+
+    for row in rows:
+        row["faiss_id"] = shot_uid(row["shot_id"])
+
+    index = vector_index.migrate(
+        index, FAISS_INDEX_KIND, ids=[row["faiss_id"] for row in rows]
+    )
+    metadata = {row["faiss_id"]: row for row in rows}
+
+    save_faiss(index, metadata)
+    ShotCatalog().attach_index_rows(rows)
+    return index, metadata
+
+
 def load_or_create_faiss():
-    if os.path.exists(FAISS_INDEX_FILE) and os.path.exists(METADATA_FILE):
+    # metadata: {faiss_id: entry}
+    if os.path.exists(FAISS_INDEX_FILE) and _has_metadata():
         index = faiss.read_index(FAISS_INDEX_FILE)
-        with open(METADATA_FILE, "r") as f:
-            metadata = json.load(f)
+
+        if not vector_index.is_id_mapped(index):
+            return _migrate_legacy_index(index, _read_metadata())
+
+        vector_index.configure_search(index)
+        metadata = {row["faiss_id"]: row for row in _read_metadata()}
+
+        if not os.path.exists(METADATA_FILE):
+            save_faiss(index, metadata)
     else:
-        index = faiss.IndexFlatL2(embedding_model.get_sentence_embedding_dimension())
-        metadata = []
+        index = vector_index.make_index(
+            get_embedding_model().get_sentence_embedding_dimension(),
+            vector_index.initial_kind(FAISS_INDEX_KIND),
+        )
+        metadata = {}
 
     return index, metadata
 
 
+def check_encoder(store):
+    # refuse an index embedded by another encoder (legacy stores record none)
+    built_with = store.info.get("encoder")
+    if built_with and built_with != ENCODER_INFO:
+        raise ValueError(
+            f"FAISS index was embedded with {built_with['embedding_model']} "
+            f"({built_with['embedding_backend']}), not {EMBEDDING_MODEL_NAME} "
+            f"({EMBEDDING_BACKEND}): set EMBEDDING_BACKEND={built_with['embedding_backend']} "
+            f"or re-embed with `python semantic_search.py rebuild --reembed`"
+        )
+
+
+def read_mapped_index(path):
+    # IO_FLAG_MMAP_IFC maps Flat / HNSW vector storage straight from the file;
+    # IVF inverted lists reject it ("mmap only supported for File objects")
+    # and are mapped with IO_FLAG_MMAP instead
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+
+def load_search_index():
+    # Read-only load for serving: the index is memory-mapped and metadata rows
+    # are decoded lazily, so startup cost doesn't grow with the library and
+    # every worker process shares the same page cache.
+    if not (os.path.exists(FAISS_INDEX_FILE) and os.path.exists(METADATA_FILE)):
+        # nothing indexed yet, or legacy files that must be migrated first
+        return load_or_create_faiss()
+
+    index = read_mapped_index(FAISS_INDEX_FILE)
+    if not vector_index.is_id_mapped(index):
+        return load_or_create_faiss()
+
+    store = MetadataStore(METADATA_FILE)
+    check_encoder(store)
+
+    vector_index.configure_search(index)
+    return index, store
+
+
+def build_lexical_index(catalog=None):
+    catalog = catalog or ShotCatalog()
+    lexical = LexicalIndex.build(
+        (faiss_id, record.get("signals", {}).get("dialogue", ""))
+        for faiss_id, record in catalog.indexed_records()
+    )
+    lexical.save(LEXICAL_INDEX_FILE)
+    return lexical
+
+
+def load_lexical_index():
+    # None until the first ingest has written one → vector-only search
+    if not os.path.exists(LEXICAL_INDEX_FILE):
+        return None
+    return LexicalIndex.load(LEXICAL_INDEX_FILE)
+
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE):
+    embeddings = get_embedding_model().encode(
+        texts, batch_size=batch_size, convert_to_numpy=True
+    )
+    return vector_index.normalize(embeddings)
+
+
 ########################################
 # 4. INGEST SHOTS (INCREMENTAL)
 ########################################
-def ingest_shots_folder(shots_dir="shots"):
-    index, metadata = load_or_create_faiss()
+def _flush_batch(index, metadata, catalog, batch, batch_size):
+    from shot_analysis import generate_semantic_descriptions
+
+    if not batch:
+        return
+
+    # shots built in multi-shot mode already carry their description; the
+    # rest fan out over all API keys at once
+    need = [entry for entry in batch if not entry["description"]]
+    descriptions = generate_semantic_descriptions([entry["signals"] for entry in need])
+    for entry, desc in zip(need, descriptions):
+        entry["description"] = desc
+
+    for entry in batch:
+        entry.pop("signals")
+
+    # one vectorised encode + one index.add for the whole batch
+    embeddings = embed_texts([entry["description"] for entry in batch], batch_size)
+    ids = np.array([entry["faiss_id"] for entry in batch], dtype="int64")
+
+    index.add_with_ids(embeddings, ids)
+
+    for entry in batch:
+        metadata[entry["faiss_id"]] = entry
+        catalog.mark_indexed(
+            entry["shot_id"],
+            entry["faiss_id"],
+            entry["description"],
+            entry["cache_key"],
+            commit=False,
+        )
+        print(f"📌 Indexed {entry['video_file_name']} @ {entry['start_time']:.1f}s")
 
-    for file in sorted(os.listdir(shots_dir)):
-        if not file.endswith(".json"):
-            continue
+    catalog.commit()
+    batch.clear()
 
-        with open(os.path.join(shots_dir, file), "r") as f:
-            shot = json.load(f)
 
-        # 🔥 BACKWARD-COMPATIBLE VIDEO NAME
-        video_file_name = shot.get(
-            "video_file_name",
-            os.path.basename(shot.get("source_video", ""))
-        )
+def ingest_shots_folder(shots_dir=SHOTS_DIR, batch_size=EMBED_BATCH_SIZE, catalog=None):
+    from llm_backend import print_cache_stats
 
-        if not video_file_name:
-            print(f"⚠️ Skipping {file} (no video reference)")
-            continue
+    if os.path.exists(METADATA_FILE):
+        check_encoder(MetadataStore(METADATA_FILE))
+    index, metadata = load_or_create_faiss()
 
-        # 🔥 STABLE DEDUP
-        if any(m.get("video_file_name") == video_file_name for m in metadata):
-            continue
+    catalog = catalog or ShotCatalog()
+    catalog.sync_shots_dir(shots_dir)
+
+    # index metadata predates the catalog → adopt its ids once (before the
+    # retired rows are read, so a retired pre-windowing shot has its id)
+    retired = catalog.retired_shots()
+    mapped = catalog.indexed_count() + sum(row["faiss_id"] is not None for row in retired)
+    if mapped != vector_index.live_count(index):
+        catalog.attach_index_rows(metadata.values())
+        retired = catalog.retired_shots()
+
+    # windows superseded by a rebuild (see build_shots) leave the index first
+    retired_ids = [row["faiss_id"] for row in retired if row["faiss_id"] is not None]
+    index = vector_index.remove_ids(index, retired_ids)
+    for faiss_id in retired_ids:
+        metadata.pop(faiss_id, None)
+
+    todo = []
+    stale_ids = []
+
+    # only shots that were (re)built since the last ingest
+    for row in catalog.pending_shots():
+        shot = json.loads(row["record"])
+        video_file_name = row["video_file_name"]
+
+        cache_key = content_key(
+            INDEX_VERSION, GEMINI_MODEL, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, shot["signals"]
+        )
 
-        desc = generate_semantic_description(shot["signals"])
-        embedding = embedding_model.encode([desc], convert_to_numpy=True)
+        # 🔥 STABLE DEDUP: skip unless the shot's signals or models changed
+        # (vectors without a key predate the cache → re-embedded once)
+        faiss_id = row["faiss_id"]
+        if faiss_id is not None:
+            if row["index_key"] == cache_key:
+                catalog.mark_indexed(row["shot_id"], faiss_id, row["description"], row["index_key"])
+                continue
 
-        index.add(embedding)
+            # stale vector → removed below, before its replacement is added
+            stale_ids.append(faiss_id)
+            metadata.pop(faiss_id, None)
+            catalog.clear_faiss_id(faiss_id)
 
-        metadata.append(
+        todo.append(
             {
+                "faiss_id": shot_uid(shot["shot_id"]),
                 "shot_id": shot["shot_id"],
                 "video_file_name": video_file_name,
                 "source_video": shot.get("source_video"),
-                "description": desc,
+                "start_time": shot.get("start_time", 0.0),
+                "end_time": shot.get("end_time"),
+                "signals": shot["signals"],
+                "description": shot.get("description"),
+                "cache_key": cache_key,
             }
         )
 
-        print(f"📌 Indexed {video_file_name}")
+    index = vector_index.remove_ids(index, stale_ids)
+
+    for start in range(0, len(todo), batch_size):
+        _flush_batch(index, metadata, catalog, todo[start:start + batch_size], batch_size)
 
-    faiss.write_index(index, FAISS_INDEX_FILE)
-    with open(METADATA_FILE, "w") as f:
-        json.dump(metadata, f, indent=2)
+    # auto mode: switch Flat → HNSW → IVF-PQ as the corpus grows; explicit
+    # IVF kinds are trained here once there is enough to train on
+    index = vector_index.maybe_grow(index, FAISS_INDEX_KIND)
+
+    save_faiss(index, metadata)
+    catalog.delete_shots([row["shot_id"] for row in retired])
+    build_lexical_index(catalog)
 
     print("✅ FAISS index updated")
+    print_cache_stats()
+
+
+def rebuild_index(kind=FAISS_INDEX_KIND, reembed=False):
+    # Re-pack the index as another kind (or re-embed every description, e.g.
+    # after changing the embedding model / backend). No LLM calls either way.
+    if not reembed and os.path.exists(METADATA_FILE):
+        check_encoder(MetadataStore(METADATA_FILE))
+    index, metadata = load_or_create_faiss()
+
+    if reembed or vector_index.kind_of(index) == "ivf_pq":
+        # PQ codes are lossy → rebuild from the source descriptions
+        rows = list(metadata.values())
+        vectors = embed_texts([row["description"] for row in rows])
+        index = vector_index.build_index(vectors, [row["faiss_id"] for row in rows], kind)
+    else:
+        index = vector_index.migrate(index, kind)
+
+    save_faiss(index, metadata)
+    build_lexical_index()
+    print(f"✅ Rebuilt FAISS index as {vector_index.kind_of(index)} ({index.ntotal} vectors)")
+
 
 ########################################
 # 5. SEMANTIC SEARCH
 ########################################
-def semantic_search(query: str, index, metadata, k=TOP_K_RESULTS):
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def _query_key(query: str) -> str:
+    # whitespace-insensitive key; the MiniLM tokenizer is uncased
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def embed_queries(queries: list) -> np.ndarray:
+    # LRU of query embeddings; everything missing goes through ONE encode
+    keys = [_query_key(query) for query in queries]
+    vectors = {}
+
+    with _query_cache_lock:
+        for key in keys:
+            if key in _query_cache:
+                _query_cache.move_to_end(key)
+                vectors[key] = _query_cache[key]
+
+    missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+    if missing:
+        encoded = embed_texts(missing)
+        with _query_cache_lock:
+            for key, vector in zip(missing, encoded):
+                vector.setflags(write=False)
+                vectors[key] = _query_cache[key] = vector
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+
+    return np.vstack([vectors[key] for key in keys])
+
+
+def embed_query(query: str) -> np.ndarray:
+    return embed_queries([query])
+
+
+def _vector_hits(metadata, scores, ids):
+    # ids missing from the metadata: retired, and the index loaded alongside
+    # it predates their removal (see save_faiss)
+    return [
+        dict(metadata[i], score=float(score))
+        for score, i in zip(scores, ids)
+        if i != -1 and i in metadata
+    ]
+
+
+def semantic_search(query: str, index, metadata, k=TOP_K_RESULTS, id_filter=None):
+    # id_filter: only score these faiss ids (e.g. lexical candidates)
     if index.ntotal == 0:
         return []
 
-    query_vec = embedding_model.encode([query], convert_to_numpy=True)
+    query_vec = embed_query(query)
     k = min(k, index.ntotal)
 
-    _, indices = index.search(query_vec, k)
-    return [metadata[i] for i in indices[0] if i != -1]
+    params = None
+    if id_filter is not None:
+        params = vector_index.filtered_search_params(index, id_filter, k)
+    elif len(metadata) < index.ntotal:
+        params = vector_index.live_search_params(index)  # tombstones to skip
+
+    scores, ids = index.search(query_vec, k, params=params)
+    return _vector_hits(metadata, scores[0], ids[0])
+
+
+def semantic_search_batch(queries: list, index, metadata, k=TOP_K_RESULTS):
+    # many queries → one encode + one index.search (see search_server.py)
+    if index.ntotal == 0 or not queries:
+        return [[] for _ in queries]
+
+    params = None
+    if len(metadata) < index.ntotal:
+        params = vector_index.live_search_params(index)  # tombstones to skip
+
+    scores, ids = index.search(embed_queries(queries), min(k, index.ntotal), params=params)
+    return [_vector_hits(metadata, s, i) for s, i in zip(scores, ids)]
+
+
+def hybrid_search(query: str, index, metadata, lexical, k=TOP_K_RESULTS,
+                  vector_hits=None):
+    # vector_hits: this query's unfiltered FAISS hits, if already computed
+    # FAISS over descriptions + BM25 over dialogue (exact quotes), merged by
+    # reciprocal rank fusion: score = Σ 1 / (RRF_K + rank) over both lists.
+    prefilter = index.ntotal >= LEXICAL_PREFILTER_MIN_VECTORS
+    lexical_hits = lexical.search(
+        query, max(k, LEXICAL_PREFILTER_CANDIDATES) if prefilter else k
+    )
+
+    id_filter = None
+    if prefilter and len(lexical_hits) >= k:
+        id_filter = [faiss_id for faiss_id, _ in lexical_hits]
+
+    if vector_hits is None or id_filter is not None:
+        vector_hits = semantic_search(query, index, metadata, k, id_filter=id_filter)
+
+    fused = {}
+    for rank, hit in enumerate(vector_hits, start=1):
+        entry = dict(hit, vector_score=hit["score"], score=0.0)
+        entry["score"] += 1.0 / (RRF_K + rank)
+        fused[hit["faiss_id"]] = entry
+
+    for rank, (faiss_id, bm25) in enumerate(lexical_hits[:k], start=1):
+        if faiss_id not in fused:
+            try:
+                fused[faiss_id] = dict(metadata[faiss_id], score=0.0)
+            except KeyError:
+                continue  # lexical index ahead of the loaded metadata
+        fused[faiss_id]["lexical_score"] = bm25
+        fused[faiss_id]["score"] += 1.0 / (RRF_K + rank)
+
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:k]
+
+
+def _group_by_video(hits, k, windows_per_video):
+    # Window hits → per-video results ranked by their best window, carrying
+    # that window's start/end plus the next best moments in the same film.
+    videos = {}
+    for hit in hits:
+        video = hit.get("source_video") or hit["video_file_name"]
+        if video not in videos:
+            if len(videos) == k:
+                continue
+            videos[video] = dict(hit, hits=[])
+
+        if len(videos[video]["hits"]) < windows_per_video:
+            videos[video]["hits"].append({
+                "shot_id": hit["shot_id"],
+                "start_time": hit.get("start_time", 0.0),
+                "end_time": hit.get("end_time"),
+                "score": hit["score"],
+                "description": hit.get("description"),
+            })
+
+    return list(videos.values())
+
+
+def search_videos(query: str, index, metadata, k=TOP_K_RESULTS,
+                  windows_per_video=WINDOWS_PER_VIDEO, lexical=None, vector_hits=None):
+    n_hits = k * SEARCH_OVERSAMPLE
+    if lexical is not None and len(lexical):
+        hits = hybrid_search(query, index, metadata, lexical, n_hits, vector_hits)
+    elif vector_hits is not None:
+        hits = vector_hits
+    else:
+        hits = semantic_search(query, index, metadata, n_hits)
+
+    return _group_by_video(hits, k, windows_per_video)
+
+
+def search_videos_batch(queries: list, index, metadata, k=TOP_K_RESULTS,
+                        windows_per_video=WINDOWS_PER_VIDEO, lexical=None):
+    # batched FAISS stage shared by all queries, per-query fusion/grouping
+    batch_hits = semantic_search_batch(queries, index, metadata, k * SEARCH_OVERSAMPLE)
+    return [
+        search_videos(query, index, metadata, k, windows_per_video, lexical, hits)
+        for query, hits in zip(queries, batch_hits)
+    ]
+
+
+class LiveSearchIndex:
+    # Serving-side handle on the index files: get() hot-swaps in a freshly
+    # memory-mapped index whenever an ingest / rebuild has replaced them, so
+    # the app never needs a restart. One instance per process.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.index = None
+        self.metadata = None
+        self.lexical = None
+
+    @staticmethod
+    def _file_stamp():
+        # files are swapped in with os.replace → inode + mtime change
+        stamp = []
+        for path in (FAISS_INDEX_FILE, METADATA_FILE, LEXICAL_INDEX_FILE):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def get(self):
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    if self._stamp is not None:
+                        print("🔄 Index files changed, reloading")
+                    self.index, self.metadata = load_search_index()
+                    self.lexical = load_lexical_index()
+                    self._stamp = stamp
+        return self.index, self.metadata
+
+    def search(self, query: str, k=TOP_K_RESULTS):
+        index, metadata = self.get()
+        return search_videos(query, index, metadata, k, lexical=self.lexical)
+
+    def search_batch(self, queries: list, k=TOP_K_RESULTS):
+        index, metadata = self.get()
+        return search_videos_batch(queries, index, metadata, k, lexical=self.lexical)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index shots into FAISS")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("ingest", help="index new / changed shots (default)")
+    rebuild = sub.add_parser("rebuild", help="rebuild / migrate the index")
+    rebuild.add_argument("--kind", default=FAISS_INDEX_KIND,
+                         choices=("auto",) + vector_index.INDEX_KINDS)
+    rebuild.add_argument("--reembed", action="store_true",
+                         help="re-encode every description instead of copying vectors")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild_index(args.kind, args.reembed)
+    else:
+        ingest_shots_folder()
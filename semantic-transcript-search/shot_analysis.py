@@ -0,0 +1,236 @@
+import json
+from llm_backend import EMOTIONS, INTENSITIES, get_llm_backend
+from llm_scheduler import get_scheduler
+from semantic_search import GEMINI_MODEL, LLM_BATCH_SHOTS
+
+# LLM side of the pipeline (emotion inference + scene descriptions). Only
+# build_shots / ingest import this; search never pays for LLM clients or keys.
+
+
+########################################
+# 1. EMOTION INFERENCE
+def _emotion_prompt(dialogue: str) -> str:
+    return f"""
+Analyze the following movie dialogue.
+
+Dialogue:
+\"\"\"
+{dialogue}
+\"\"\"
+
+Return STRICT JSON:
+{{
+  "emotion": one of [anger, sadness, fear, frustration, hope, resignation, affection, confidence, uncertainty],
+  "emotional_intensity": one of [low, medium, high],
+  "tone": string
+}}
+"""
+
+
+def infer_emotion_from_dialogue(dialogue: str) -> dict:
+    # cached on (model, prompt, temperature); key rotation lives in the backend
+    text = get_llm_backend().generate(
+        _emotion_prompt(dialogue), GEMINI_MODEL, 0.1, json_mode=True, task="emotion"
+    )
+    return json.loads(text)
+
+
+NEUTRAL_EMOTION = {"emotion": "uncertainty", "emotional_intensity": "low", "tone": "neutral"}
+
+
+def infer_emotions(dialogues: list) -> list:
+    # concurrent across all API keys (see llm_scheduler); one failed request
+    # falls back to a neutral emotion instead of aborting the whole build
+    texts = get_scheduler().map(
+        (
+            {
+                "prompt": _emotion_prompt(dialogue),
+                "model": GEMINI_MODEL,
+                "temperature": 0.1,
+                "json_mode": True,
+                "task": "emotion",
+            }
+            for dialogue in dialogues
+        ),
+        return_exceptions=True,
+    )
+
+    emotions = []
+    for text in texts:
+        if not isinstance(text, Exception):
+            try:
+                emotions.append(json.loads(text))
+                continue
+            except ValueError as e:
+                text = e
+
+        print(f"⚠️ Emotion request failed ({text}), using neutral emotion")
+        emotions.append(dict(NEUTRAL_EMOTION))
+    return emotions
+
+
+########################################
+# 2. SEMANTIC DESCRIPTION
+########################################
+def _description_prompt(signals: dict) -> str:
+    return f"""
+You are analyzing a film scene for semantic search.
+
+Signals:
+- Dialogue: "{signals['dialogue']}"
+- Dominant emotion: {signals['emotion']}
+- Emotional intensity: {signals['emotional_intensity']}
+- Tone: {signals['tone']}
+- Longest silence: {signals['pause_duration']} seconds
+
+Task:
+Write ONE concise sentence describing the emotional intent
+and narrative meaning of this moment.
+Avoid metaphors. Use neutral language.
+"""
+
+
+def generate_semantic_description(signals: dict) -> str:
+    text = get_llm_backend().generate(
+        _description_prompt(signals), GEMINI_MODEL, 0.2, task="description"
+    )
+    return text.strip()
+
+
+def generate_semantic_descriptions(signals_list: list) -> list:
+    texts = get_scheduler().map(
+        {
+            "prompt": _description_prompt(signals),
+            "model": GEMINI_MODEL,
+            "temperature": 0.2,
+            "task": "description",
+        }
+        for signals in signals_list
+    )
+    return [text.strip() for text in texts]
+
+
+########################################
+# 2b. MULTI-SHOT ANALYSIS (EMOTION + DESCRIPTION)
+########################################
+def _shot_batch_prompt(items: list) -> str:
+    scenes = [
+        {
+            "id": i,
+            "dialogue": item["dialogue"],
+            "longest_silence_seconds": item["pause_duration"],
+        }
+        for i, item in enumerate(items)
+    ]
+
+    return f"""
+You are analyzing film scenes for semantic search.
+
+For EACH scene below:
+- infer the dominant emotion, its intensity and the tone from the dialogue
+- write ONE concise sentence describing the emotional intent
+  and narrative meaning of the moment. Avoid metaphors. Use neutral language.
+
+Scenes:
+```json
+{json.dumps(scenes, indent=1)}
+```
+
+Return STRICT JSON: a list with exactly one object per scene:
+[
+  {{
+    "id": the scene id,
+    "emotion": one of [{", ".join(EMOTIONS)}],
+    "emotional_intensity": one of [{", ".join(INTENSITIES)}],
+    "tone": string,
+    "description": string
+  }}
+]
+"""
+
+
+def _valid_analysis(item) -> bool:
+    return (
+        isinstance(item, dict)
+        and str(item.get("emotion", "")).lower() in EMOTIONS
+        and str(item.get("emotional_intensity", "")).lower() in INTENSITIES
+        and isinstance(item.get("tone"), str)
+        and isinstance(item.get("description"), str)
+        and item["description"].strip() != ""
+    )
+
+
+def _parse_shot_batch(text, count) -> dict:
+    # → {scene index: analysis} for the items that validated
+    try:
+        items = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+
+    if isinstance(items, dict):
+        items = items.get("scenes", [])
+    if not isinstance(items, list):
+        return {}
+
+    parsed = {}
+    for item in items:
+        if not _valid_analysis(item):
+            continue
+        try:
+            idx = int(item["id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= idx < count:
+            parsed[idx] = {
+                "emotion": item["emotion"].lower(),
+                "emotional_intensity": item["emotional_intensity"].lower(),
+                "tone": item["tone"],
+                "description": item["description"].strip(),
+            }
+    return parsed
+
+
+def analyze_shots(items: list, batch_size=LLM_BATCH_SHOTS) -> list:
+    # items: [{"dialogue", "pause_duration"}] → one {"emotion",
+    # "emotional_intensity", "tone", "description"} per item. N shots share a
+    # request; anything missing or malformed falls back to per-item calls.
+    chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    texts = get_scheduler().map(
+        (
+            {
+                "prompt": _shot_batch_prompt(chunk),
+                "model": GEMINI_MODEL,
+                "temperature": 0.1,
+                "json_mode": True,
+                "task": "shot_batch",
+            }
+            for chunk in chunks
+        ),
+        return_exceptions=True,
+    )
+
+    results = [None] * len(items)
+    for chunk_no, (chunk, text) in enumerate(zip(chunks, texts)):
+        if isinstance(text, Exception):
+            print(f"⚠️ Batch request failed ({text}), falling back per shot")
+            continue
+
+        for idx, analysis in _parse_shot_batch(text, len(chunk)).items():
+            results[chunk_no * batch_size + idx] = analysis
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        print(f"↩️ {len(missing)} shot(s) fell back to single requests")
+
+        emotions = infer_emotions([items[i]["dialogue"] for i in missing])
+        signals_list = [
+            dict(emotion, dialogue=items[i]["dialogue"], pause_duration=items[i]["pause_duration"])
+            for i, emotion in zip(missing, emotions)
+        ]
+        descriptions = generate_semantic_descriptions(signals_list)
+
+        for i, emotion, desc in zip(missing, emotions, descriptions):
+            results[i] = dict(emotion, description=desc)
+
+    return results
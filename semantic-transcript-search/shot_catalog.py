@@ -0,0 +1,267 @@
+import os
+import json
+import sqlite3
+import threading
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+CATALOG_FILE = os.path.join(BASE_PATH, "catalog.db")
+
+# Shot lifecycle
+STATE_BUILT = "built"      # shot JSON written, not yet in the FAISS index
+STATE_INDEXED = "indexed"  # embedded, faiss_id points at its index row
+STATE_RETIRED = "retired"  # superseded by a rebuild; vector still to be removed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shots (
+    shot_id         TEXT PRIMARY KEY,
+    video_file_name TEXT NOT NULL,
+    source_video    TEXT,
+    source_timeline TEXT,
+    shot_path       TEXT,
+    cache_key       TEXT,
+    index_key       TEXT,
+    faiss_id        INTEGER,
+    state           TEXT NOT NULL DEFAULT 'built',
+    description     TEXT,
+    record          TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_shots_video ON shots(video_file_name);
+CREATE INDEX IF NOT EXISTS idx_shots_state ON shots(state);
+CREATE INDEX IF NOT EXISTS idx_shots_faiss ON shots(faiss_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def video_name_of(shot):
+    # 🔥 BACKWARD-COMPATIBLE VIDEO NAME
+    return shot.get(
+        "video_file_name",
+        os.path.basename(shot.get("source_video", ""))
+    )
+
+
+class ShotCatalog:
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        # Streamlit serves reruns from worker threads → share one connection
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------------- META ----------------
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    # ---------------- SHOTS DIR SYNC ----------------
+    def sync_shots_dir(self, shots_dir):
+        # Picks up shot JSONs written outside the catalog (e.g. older runs).
+        # Skipped entirely while the directory is unchanged, and only files
+        # the catalog doesn't know yet are opened.
+        if not os.path.isdir(shots_dir):
+            return 0
+
+        meta_key = f"shots_dir_mtime:{os.path.abspath(shots_dir)}"
+        mtime = str(os.stat(shots_dir).st_mtime_ns)
+        if self._get_meta(meta_key) == mtime:
+            return 0
+
+        with self._lock:
+            known = {
+                row["shot_path"]
+                for row in self.conn.execute("SELECT shot_path FROM shots")
+            }
+
+            added = 0
+            for file in os.listdir(shots_dir):
+                if not file.endswith(".json"):
+                    continue
+
+                shot_path = os.path.abspath(os.path.join(shots_dir, file))
+                if shot_path in known:
+                    continue
+
+                with open(shot_path, "r") as f:
+                    shot = json.load(f)
+
+                if not video_name_of(shot):
+                    continue
+
+                self.upsert_shot(shot, shot_path, commit=False)
+                added += 1
+
+            self._set_meta(meta_key, mtime)
+            self.conn.commit()
+
+        return added
+
+    # ---------------- WRITES ----------------
+    def upsert_shot(self, shot, shot_path, commit=True):
+        # (Re)built shot → needs (re)indexing; keep its faiss_id so the stale
+        # vector can be found and replaced.
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO shots (shot_id, video_file_name, source_video,
+                                   source_timeline, shot_path, cache_key,
+                                   state, record)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(shot_id) DO UPDATE SET
+                    video_file_name = excluded.video_file_name,
+                    source_video    = excluded.source_video,
+                    source_timeline = excluded.source_timeline,
+                    shot_path       = excluded.shot_path,
+                    cache_key       = excluded.cache_key,
+                    state           = excluded.state,
+                    record          = excluded.record
+                """,
+                (
+                    shot["shot_id"],
+                    video_name_of(shot),
+                    shot.get("source_video"),
+                    shot.get("source_timeline"),
+                    os.path.abspath(shot_path),
+                    shot.get("cache_key"),
+                    STATE_BUILT,
+                    json.dumps(shot),
+                ),
+            )
+            if commit:
+                self.conn.commit()
+
+    def mark_indexed(self, shot_id, faiss_id, description, index_key, commit=True):
+        with self._lock:
+            self.conn.execute(
+                """
+                UPDATE shots
+                SET faiss_id = ?, description = ?, index_key = ?, state = ?
+                WHERE shot_id = ?
+                """,
+                (faiss_id, description, index_key, STATE_INDEXED, shot_id),
+            )
+            if commit:
+                self.conn.commit()
+
+    def clear_faiss_id(self, faiss_id, commit=True):
+        # vector removed from the index → shot must be re-embedded
+        with self._lock:
+            self.conn.execute(
+                "UPDATE shots SET faiss_id = NULL, state = ? WHERE faiss_id = ?",
+                (STATE_BUILT, int(faiss_id)),
+            )
+            if commit:
+                self.conn.commit()
+
+    def attach_index_rows(self, metadata):
+        # One-off migration: adopt the faiss ids recorded in the index metadata.
+        # Shots a rebuild already retired stay retired, so ingest still finds
+        # (and removes) their vectors.
+        with self._lock:
+            self.conn.execute("UPDATE shots SET faiss_id = NULL")
+            for entry in metadata:
+                self.conn.execute(
+                    """
+                    UPDATE shots
+                    SET faiss_id = ?, description = ?, index_key = ?,
+                        state = CASE WHEN state = ? THEN state ELSE ? END
+                    WHERE shot_id = ?
+                    """,
+                    (
+                        entry["faiss_id"],
+                        entry.get("description"),
+                        entry.get("cache_key"),
+                        STATE_RETIRED,
+                        STATE_INDEXED,
+                        entry.get("shot_id"),
+                    ),
+                )
+            self.conn.commit()
+
+    def retire_video_shots(self, video_file_name, keep_ids=()):
+        # A rebuilt video's old windows (or pre-windowing whole-video shot)
+        # → retired; ingest drops their vectors, then delete_shots() the rows.
+        keep_ids = set(keep_ids)
+        with self._lock:
+            rows = [
+                dict(row)
+                for row in self.conn.execute(
+                    "SELECT * FROM shots WHERE video_file_name = ? AND state != ?",
+                    (video_file_name, STATE_RETIRED),
+                )
+                if row["shot_id"] not in keep_ids
+            ]
+            self.conn.executemany(
+                "UPDATE shots SET state = ? WHERE shot_id = ?",
+                [(STATE_RETIRED, row["shot_id"]) for row in rows],
+            )
+            self.conn.commit()
+        return rows
+
+    def delete_shots(self, shot_ids, commit=True):
+        with self._lock:
+            self.conn.executemany(
+                "DELETE FROM shots WHERE shot_id = ?", [(i,) for i in shot_ids]
+            )
+            if commit:
+                self.conn.commit()
+
+    def commit(self):
+        with self._lock:
+            self.conn.commit()
+
+    # ---------------- READS ----------------
+    def get_by_video(self, video_file_name):
+        row = self.conn.execute(
+            "SELECT * FROM shots WHERE video_file_name = ? AND state != ? LIMIT 1",
+            (video_file_name, STATE_RETIRED),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def pending_shots(self):
+        rows = self.conn.execute(
+            "SELECT * FROM shots WHERE state = ? ORDER BY shot_id", (STATE_BUILT,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def retired_shots(self):
+        rows = self.conn.execute(
+            "SELECT * FROM shots WHERE state = ?", (STATE_RETIRED,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def indexed_records(self):
+        # → (faiss_id, shot record) for every shot currently in the index
+        rows = self.conn.execute(
+            "SELECT faiss_id, record FROM shots WHERE faiss_id IS NOT NULL AND state = ?",
+            (STATE_INDEXED,),
+        )
+        for row in rows:
+            yield row["faiss_id"], json.loads(row["record"])
+
+    def indexed_count(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM shots WHERE faiss_id IS NOT NULL AND state != ?",
+            (STATE_RETIRED,),
+        ).fetchone()[0]
+
+    def next_shot_number(self):
+        row = self.conn.execute(
+            """
+            SELECT MAX(CAST(SUBSTR(shot_id, 5) AS INTEGER)) FROM shots
+            WHERE shot_id LIKE 'shot%'
+            """
+        ).fetchone()
+        return (row[0] or 0) + 1
@@ -0,0 +1,295 @@
+import os
+import math
+import hashlib
+import faiss
+import numpy as np
+
+# ---------------- CONFIG ----------------
+# auto | flat | hnsw | ivf_flat | ivf_pq
+FAISS_INDEX_KIND = os.getenv("FAISS_INDEX_KIND", "auto")
+
+# auto: exact search while it's cheap, then graph, then compressed IVF
+FLAT_MAX_VECTORS = 50_000
+HNSW_MAX_VECTORS = 2_000_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+# filtered search aims to see this many allowed vectors per result wanted
+FILTER_SLACK = 2
+PQ_BITS = 8
+TRAIN_SAMPLE = 100_000
+# IVF kinds are trained over the whole corpus once it has this many vectors
+# (≥39 points per PQ centroid); until then the index stays flat
+IVF_MIN_VECTORS = 39 * 2 ** PQ_BITS
+# HNSW can't delete in place: removed vectors stay in the graph as tombstones
+# (id TOMBSTONE_ID, never returned) until they are this fraction of it, then
+# the graph is compacted in one rebuild
+TOMBSTONE_MAX_FRACTION = float(os.getenv("FAISS_TOMBSTONE_FRACTION", "0.1"))
+TOMBSTONE_ID = -1
+# ----------------------------------------
+
+INDEX_KINDS = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+IVF_KINDS = ("ivf_flat", "ivf_pq")
+
+
+def shot_uid(key: str) -> int:
+    # stable 63-bit id (positive int64) derived from the shot id
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def normalize(vectors) -> np.ndarray:
+    # cosine similarity = inner product over L2-normalised vectors
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype="float32"))
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def choose_kind(n_vectors: int) -> str:
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def _nlist(n_vectors: int) -> int:
+    # ~4·√n lists, keeping ≥39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // 39 or 1))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    for m in (dim // 8, dim // 4, dim // 2, dim):
+        if m and dim % m == 0:
+            return m
+    return 1
+
+
+def initial_kind(kind: str = FAISS_INDEX_KIND) -> str:
+    # kind of a new, empty index: IVF needs a corpus to train on, so it
+    # starts flat (see maybe_grow)
+    return "flat" if kind == "auto" or kind in IVF_KINDS else kind
+
+
+def make_index(dim: int, kind: str = "flat", n_vectors: int = 0):
+    # IVF kinds are only trainable with n_vectors ≥ IVF_MIN_VECTORS; use
+    # build_index, which trains on the vectors it is given
+    if kind == "auto":
+        kind = choose_kind(n_vectors)
+
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if kind == "flat":
+        inner = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivf_flat":
+        quantizer = faiss.IndexFlatIP(dim)
+        inner = faiss.IndexIVFFlat(quantizer, dim, _nlist(n_vectors), metric)
+        inner.own_fields = True
+        quantizer.this.disown()
+    elif kind == "ivf_pq":
+        quantizer = faiss.IndexFlatIP(dim)
+        inner = faiss.IndexIVFPQ(
+            quantizer, dim, _nlist(n_vectors), _pq_subquantizers(dim), PQ_BITS, metric
+        )
+        inner.own_fields = True
+        quantizer.this.disown()
+    else:
+        raise ValueError(f"Unknown FAISS index kind: {kind}")
+
+    index = faiss.IndexIDMap2(inner)
+    configure_search(index)
+    return index
+
+
+def inner_index(index):
+    return faiss.downcast_index(index.index)
+
+
+def is_id_mapped(index) -> bool:
+    return hasattr(index, "id_map")
+
+
+def kind_of(index) -> str:
+    inner = inner_index(index) if is_id_mapped(index) else index
+
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def configure_search(index):
+    # search-time knobs are not (reliably) persisted → set after every load
+    inner = inner_index(index) if is_id_mapped(index) else index
+
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(IVF_NPROBE, inner.nlist)
+
+
+def filtered_search_params(index, ids, k):
+    # SearchParameters restricted to `ids`, typed for the index kind (IVF and
+    # HNSW reject the base class). Only allowed vectors can be returned, so
+    # the search is widened until it should meet ~FILTER_SLACK·k of them:
+    # HNSW's candidate queue scales with 1 / (allowed fraction), IVF probes
+    # enough lists to cover that many allowed vectors on average.
+    ids = np.asarray(ids, dtype="int64")
+    selector = faiss.IDSelectorBatch(ids)
+    inner = inner_index(index) if is_id_mapped(index) else index
+    wanted = FILTER_SLACK * k
+
+    kind = kind_of(index)
+    if kind == "hnsw":
+        ef = math.ceil(wanted * index.ntotal / max(len(ids), 1))
+        ef = min(max(HNSW_EF_SEARCH, ef), max(index.ntotal, HNSW_EF_SEARCH))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef)
+    if kind in ("ivf_flat", "ivf_pq"):
+        nprobe = math.ceil(wanted * inner.nlist / max(len(ids), 1))
+        nprobe = min(max(IVF_NPROBE, nprobe), inner.nlist)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def live_search_params(index):
+    # → SearchParameters that skip tombstones (see remove_ids), or None when
+    # the index kind deletes in place. Filtered searches need no extra step:
+    # their allowed ids never include TOMBSTONE_ID.
+    if kind_of(index) != "hnsw":
+        return None
+    selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.array([TOMBSTONE_ID], dtype="int64")))
+    return faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+
+
+def tombstone_count(index) -> int:
+    if not is_id_mapped(index):
+        return 0
+    return int(np.count_nonzero(faiss.vector_to_array(index.id_map) == TOMBSTONE_ID))
+
+
+def live_count(index) -> int:
+    return index.ntotal - tombstone_count(index)
+
+
+def build_index(vectors, ids, kind: str = "auto"):
+    vectors = normalize(vectors)
+    ids = np.asarray(ids, dtype="int64")
+    dim = vectors.shape[1]
+
+    if kind in IVF_KINDS and len(vectors) < IVF_MIN_VECTORS:
+        kind = "flat"  # too few vectors to train the lists on
+    index = make_index(dim, kind, len(vectors))
+
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = vectors
+        if len(vectors) > TRAIN_SAMPLE:
+            sample = vectors[rng.choice(len(vectors), TRAIN_SAMPLE, replace=False)]
+        index.train(sample)
+
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+
+    return index
+
+
+def index_contents(index):
+    # → (vectors, ids) of the live vectors in storage order; exact for
+    # flat/HNSW/IVF-Flat, approximate (decoded codes) for IVF-PQ
+    inner = inner_index(index)
+    ids = faiss.vector_to_array(index.id_map).astype("int64")
+
+    if inner.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32"), ids
+
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+
+    live = ids != TOMBSTONE_ID
+    return inner.reconstruct_n(0, inner.ntotal)[live], ids[live]
+
+
+def remove_ids(index, ids):
+    # → index without `ids`. HNSW can't delete in place, so their slots are
+    # relabelled TOMBSTONE_ID (hidden by live_search_params, free to re-add
+    # the id) and the graph is only rebuilt once tombstones pile up.
+    ids = np.asarray(list(ids), dtype="int64")
+    if len(ids) == 0:
+        return index
+
+    try:
+        index.remove_ids(ids)
+        return index
+    except RuntimeError:
+        pass
+
+    id_map = faiss.vector_to_array(index.id_map)
+    id_map[np.isin(id_map, ids)] = TOMBSTONE_ID
+    faiss.copy_array_to_vector(id_map, index.id_map)
+    index.construct_rev_map()
+
+    dead = int(np.count_nonzero(id_map == TOMBSTONE_ID))
+    if dead > TOMBSTONE_MAX_FRACTION * index.ntotal:
+        print(f"🧹 Compacting {kind_of(index)} index ({dead} tombstones)")
+        return migrate(index, kind_of(index))
+    return index
+
+
+def migrate(index, kind: str = "auto", ids=None):
+    # Re-pack into another index kind. A legacy (non-IDMap, e.g. IndexFlatL2
+    # over raw embeddings) index needs `ids` for its rows, in row order.
+    if is_id_mapped(index):
+        vectors, ids = index_contents(index)
+    else:
+        vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype="float32")
+        ids = np.asarray(ids if ids is not None else [], dtype="int64")
+
+    if kind == "auto":
+        kind = choose_kind(len(vectors))
+
+    return build_index(vectors, ids, kind)
+
+
+def _undersized_lists(index) -> bool:
+    # IVF trained on a much smaller corpus: the ideal list count has doubled
+    inner = inner_index(index)
+    return isinstance(inner, faiss.IndexIVF) and _nlist(index.ntotal) >= 2 * inner.nlist
+
+
+def maybe_grow(index, kind: str = FAISS_INDEX_KIND):
+    # In auto mode, move to the next index kind once the corpus outgrows it.
+    # An explicit IVF kind stays flat until IVF_MIN_VECTORS, then is trained
+    # once over the whole corpus. IVF-Flat lists are re-trained when the
+    # corpus has outgrown them.
+    current = kind_of(index)
+    if kind == "auto":
+        target = choose_kind(live_count(index))
+    elif kind in IVF_KINDS and index.ntotal >= IVF_MIN_VECTORS:
+        target = kind
+    else:
+        return index
+
+    if target != current:
+        print(f"🔀 Migrating FAISS index {current} → {target} ({index.ntotal} vectors)")
+        return migrate(index, target)
+
+    if _undersized_lists(index):
+        if current == "ivf_pq":
+            # PQ codes are lossy → re-train from the source descriptions
+            print(f"⚠️ {current} lists were sized for a smaller corpus; "
+                  f"run `python semantic_search.py rebuild --reembed`")
+            return index
+        print(f"🔀 Re-training {current} lists for {index.ntotal} vectors")
+        return migrate(index, target)
+
+    return index
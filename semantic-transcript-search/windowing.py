@@ -0,0 +1,83 @@
+import os
+
+# ---------------- CONFIG ----------------
+# target scene window length and how much consecutive windows overlap
+WINDOW_SECONDS = float(os.getenv("WINDOW_SECONDS", "30"))
+WINDOW_OVERLAP_SECONDS = float(os.getenv("WINDOW_OVERLAP_SECONDS", "10"))
+# windows close early at a pause at least this long (likely scene change),
+# but never before they are MIN_WINDOW_SECONDS long
+SCENE_BREAK_SILENCE = float(os.getenv("SCENE_BREAK_SILENCE", "1.5"))
+MIN_WINDOW_SECONDS = float(os.getenv("MIN_WINDOW_SECONDS", "10"))
+# ----------------------------------------
+
+
+def _speech_with_gaps(timeline):
+    # → [(speech entry, silence after it in seconds)] from the Silence entries
+    # detect_silence_from_transcript puts between speech segments
+    speech = []
+    for item in timeline:
+        if item["type"] == "Speech":
+            speech.append([item, 0.0])
+        elif item["type"] == "Silence" and speech:
+            # VAD timelines can hold several silences in one gap → longest
+            speech[-1][1] = max(speech[-1][1], item["duration"])
+    return speech
+
+
+def _window(speech, first, last):
+    segments = speech[first:last + 1]
+    # the pause after the last segment is outside the window
+    pauses = [gap for _, gap in segments[:-1]]
+    return {
+        "start_time": segments[0][0]["start"],
+        "end_time": segments[-1][0]["end"],
+        "dialogue": " ".join(seg.get("text", "").strip() for seg, _ in segments),
+        "pause_duration": max(pauses) if pauses else 0,
+    }
+
+
+def scene_windows(timeline, window_seconds=WINDOW_SECONDS,
+                  overlap_seconds=WINDOW_OVERLAP_SECONDS,
+                  break_silence=SCENE_BREAK_SILENCE,
+                  min_window_seconds=MIN_WINDOW_SECONDS):
+    # Splits a timeline into overlapping windows of whole speech segments.
+    # A window ends at the first long pause once it is min_window_seconds
+    # long, or as soon as it reaches window_seconds; the next one starts
+    # overlap_seconds before that end.
+    speech = _speech_with_gaps(timeline)
+    windows = []
+
+    first = 0
+    while first < len(speech):
+        start = speech[first][0]["start"]
+
+        last = first
+        while last + 1 < len(speech):
+            seg, gap = speech[last]
+            length = seg["end"] - start
+
+            if length >= window_seconds:
+                break
+            if gap >= break_silence and length >= min_window_seconds:
+                break
+            last += 1
+
+        windows.append(_window(speech, first, last))
+
+        if last + 1 >= len(speech):
+            break
+
+        # overlap: restart at the first segment inside the tail of this
+        # window, always moving forward by at least one segment
+        resume_at = speech[last][0]["end"] - overlap_seconds
+        nxt = first + 1
+        while nxt <= last and speech[nxt][0]["start"] < resume_at:
+            nxt += 1
+
+        # a scene break isn't worth overlapping across
+        if speech[last][1] >= break_silence:
+            nxt = last + 1
+
+        first = nxt
+
+    return windows
@@ -1,10 +1,29 @@
+import os
+import sys
 import json
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-def build_index(descriptions):
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+SEMANTIC_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "semantic-transcript-search"
+)
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def load_model(model_name=EMBEDDING_MODEL_NAME):
+    # torch / ONNX / int8 picked by EMBEDDING_BACKEND, same as the main index
+    # (semantic-transcript-search/encoders.py); the backend is only imported
+    # once a model is actually needed
+    if SEMANTIC_DIR not in sys.path:
+        sys.path.insert(0, SEMANTIC_DIR)
+    from encoders import load_encoder
+
+    return load_encoder(model_name)
+
+
+def build_index(descriptions, model=None):
+    # model: any encoder with .encode(); defaults to load_model()
+    model = model or load_model()
     embeddings = model.encode(descriptions, convert_to_numpy=True).astype("float32")
     faiss.normalize_L2(embeddings)
 